@@ -52,6 +52,7 @@ from tabulate import tabulate
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from backend.dev.vcan            import VCANThread
+from backend.dev.replay          import ReplayThread, ReplaySession
 
 from backend.server              import ServerThread
 from backend.app                 import APPThread
@@ -59,9 +60,12 @@ from backend.adc                 import ADCThread
 from backend.rti                 import RTIThread
 from backend.can                 import CANThread
 from backend.lin                 import LINThread
+from backend.input               import InputThread
 from backend.ign                 import IGNThread
 from backend.pimost              import PiMOSTThread
 
+from backend.recorder import FrameLog
+from backend.datalog import DataLog
 from backend.logger import logger
 
 from backend.shared.shared_state import shared_state
@@ -80,11 +84,13 @@ class VLINK:
             'app':      APPThread,
             'can':      CANThread,
             'lin':      LINThread,
+            'input':    InputThread,
             'adc':      ADCThread,
             'rti':      RTIThread,
             'ign':      IGNThread,
           
             'vcan':     VCANThread,
+            'replay':   ReplayThread,
         }
 
         if shared_state.pimost:
@@ -195,12 +201,19 @@ class VLINK:
 
     
     def start_modules(self):
+        # LIN and ADC read replay samples as soon as they start, so the shared
+        # clock has to be reset before any of them waits on it
+        if shared_state.replay:
+            shared_state.replay.clock.reset()
+
         if shared_state.vCan:
             self.start_thread('vcan', logger)
 
         time.sleep(.05)
         self.start_thread('ign', logger)
         time.sleep(.05)
+        self.start_thread('input', logger)
+        time.sleep(.05)
         self.start_thread('can', logger)
         time.sleep(.05)
         self.start_thread('rti', logger)
@@ -215,6 +228,10 @@ class VLINK:
             time.sleep(1)
             self.start_thread('pimost', logger)
 
+        # Start replay last, once the CAN interfaces are listening
+        if shared_state.replay:
+            self.start_thread('replay', logger)
+
     def start_thread(self, thread_name, logger):
         logger.info(f"Starting {thread_name} thread.")
         if thread_name in shared_state.THREADS:
@@ -363,9 +380,14 @@ def setup_arguments():
     parser.add_argument("--verbose", action="store_true", help="Enable verbose output")
     parser.add_argument("--vcan", action="store_true", help="Simulate CAN-Bus")
     parser.add_argument("--vlin", action="store_true", help="Simulate LIN-Bus")
+    parser.add_argument("--vadc", action="store_true", help="Simulate ADC inputs")
     parser.add_argument("--vite", action="store_false", help="Start on Vite-Port 5173")
     parser.add_argument("--nokiosk", action="store_false", help="Start in windowed mode")
     parser.add_argument("--dev", action="store_true", help="Development mode")
+    parser.add_argument("--record", metavar="DIR", help="Record CAN, LIN and ADC inputs into a session log")
+    parser.add_argument("--replay", metavar="PATH", help="Replay a recorded session (log file or directory)")
+    parser.add_argument("--replay-speed", type=float, default=1.0, help="Replay speed factor, 0 = as fast as possible")
+    parser.add_argument("--datalog", metavar="DIR", help="Log decoded CAN and ADC values into compressed session files")
 
     return parser.parse_args()
 
@@ -411,10 +433,24 @@ if __name__ == '__main__':
     shared_state.verbose = args.verbose
     shared_state.vCan = args.vcan
     shared_state.vLin = args.vlin
+    shared_state.vAdc = args.vadc
     shared_state.vite = args.vite
     shared_state.isKiosk = args.nokiosk
     shared_state.dev = args.dev
 
+    if args.record:
+        shared_state.recorder = FrameLog(args.record, prefix="session", logger=logger)
+        shared_state.recorder.start()
+
+    if args.replay:
+        shared_state.replay = ReplaySession(args.replay, args.replay_speed)
+        logger.info(f"Loaded replay session: {shared_state.replay}")
+
+    # Replayed values are already in the logs of the recorded drive
+    if args.datalog and not args.replay:
+        shared_state.datalog = DataLog(args.datalog, logger=logger)
+        shared_state.datalog.start()
+
     #Set ignition signal HIGH initially
     shared_state.ignStatus.set()
 
@@ -439,6 +475,11 @@ if __name__ == '__main__':
             print("\n\nExiting...\n")
     finally:
             vlink.join_threads()
+
+            if shared_state.recorder:
+                shared_state.recorder.close()
+            if shared_state.datalog:
+                shared_state.datalog.close()
             logger.info('Done.')
 
             if shared_state.update:
@@ -1,141 +1,243 @@
 import threading
 import time
+import math
 import json
 import os
 import numpy as np
-import socketio
 from .shared.shared_state import shared_state
-
-import board
-import busio
-import adafruit_ads1x15.ads1115 as ADS
-from adafruit_ads1x15.analog_in import AnalogIn
+from .shared.scale import compile_scale
+from .shared.characteristic import CharacteristicTable
+from .shared.filters import Filter
+from .shared.batcher import DataBatcher
+from .recorder import KIND_ADC, ADC_SAMPLE
+from .adcEngine import ADS1x15, AcquisitionEngine, INPUTS
 
 PULL_UP = 2000
+SUPPLY_VOLTAGE = 5
 STEP = 0.5
+DEFAULT_SAMPLE_RATE = 10    # samples/s of sensors without a sample_rate
 
 
 class ADCThread(threading.Thread):
-    def __init__(self, logger):
+    def __init__(self, logger, sensor_data=None):
         super().__init__()
         self.logger = logger
 
-        self.client = socketio.Client()
+        self.batcher = None
         self._stop_event = threading.Event()
 
-        self.ads = None
+        self.ads = {}           # ADC chips by device name, sharing one I2C bus
         self.i2c = None
+        self.engine = None
+
+        self.sensors = []
 
-        self.channels = []
+        self.characteristics = CharacteristicTable()
+        self.filters = []       # per sensor, smoothing the raw voltages
+        self.ntc = None         # per sensor: input is the NTC resistance instead of the voltage
+        self.voltages = None    # filtered voltage per sensor, NaN until the first sample
 
-        self.sensor_data = None
+        self.sensor_data = sensor_data  # adc.json is read when not given
         self.pressure_data = None
         self.temperature_data = None
 
     def run(self):
+        if shared_state.replay:
+            self.read_settings()
+            self.start_batcher()
+            self.read_from_replay()
+            return
+
+        self.read_settings()
         self.init_adc()
 
         if self.ads:
-            self.read_settings()
-            self.connect_to_socketio()
+            self.start_batcher()
             self.start_adc()
 
+    def start_batcher(self):
+        self.batcher = DataBatcher("/adc", self.sensor_data.get("emit_rate", 30), datalog=shared_state.datalog)
+        for sensor in self.sensors:
+            self.batcher.set_deadband(sensor["app_id"], sensor.get("deadband"))
+        self.batcher.start()
+
     def stop_thread(self):
         time.sleep(.5)
         self._stop_event.set()
+        if self.batcher:
+            self.batcher.stop()
+            for app_id, counts in self.batcher.stats().items():
+                self.logger.info(f"ADC {app_id}: {counts['emitted']} updates emitted, {counts['suppressed']} suppressed")
+        for app_id, rates in self.stats().items():
+            self.logger.info(f"ADC {app_id} ({rates['device']}): {rates['achieved']} samples/s of {rates['rate']} requested")
+
+    # ADC chips by name, a single "device" block is named "adc0"
+    def device_settings(self):
+        return self.sensor_data.get("devices") or {"adc0": self.sensor_data.get("device", {})}
 
     def init_adc(self):
+        if shared_state.vAdc:
+            self.init_simulated_adc()
+            return
+
         try:
+            # imported here so the thread can run simulated on machines without I2C
+            import board
+            import busio
             self.i2c = busio.I2C(board.SCL, board.SDA)
-            self.ads = ADS.ADS1115(self.i2c)
-            self.ads.gain = 1
         except Exception as e:
             self.logger.error(f"I2C initialization failed: {e}")
-            self.ads = None
+            return
+
+        for name, device in self.device_settings().items():
+            address = device.get("address", 0x48)
+            try:
+                self.ads[name] = ADS1x15(
+                    self.i2c,
+                    address=int(address, 0) if isinstance(address, str) else address,
+                    model=device.get("model", "ADS1115"),
+                    data_rate=device.get("data_rate", 860),
+                    gain=device.get("gain", 1),
+                )
+            except Exception as e:
+                self.logger.error(f"ADC '{name}' initialization failed: {e}")
+
+    # Simulated chips with a waveform per sensor (--vadc)
+    def init_simulated_adc(self):
+        # dev package is only needed with --vadc
+        from .dev.vadc import SimulatedADC, Waveform
+
+        for name, device in self.device_settings().items():
+            self.ads[name] = SimulatedADC(data_rate=device.get("data_rate", 860), gain=device.get("gain", 1))
+
+        for sensor in self.sensors:
+            try:
+                waveform = Waveform.from_settings(sensor.get("simulation"))
+            except ValueError as e:
+                self.logger.error(f"Error in simulation of ADC sensor '{sensor['app_id']}', using the default: {e}")
+                waveform = Waveform()
+            self.ads[sensor["device"]].set_waveform(INPUTS[sensor["channel"]], waveform)
 
 
     def start_adc(self):
-        while not self._stop_event.is_set():
-            self.read_sensor()
-            time.sleep(.1)
-        #self.disconnect_from_socketio()
+        output_interval = 1.0 / self.sensor_data.get("emit_rate", 30)
+        self.engine = AcquisitionEngine(self.ads, self.store_sample, self.process_output, output_interval)
+        for sensor in self.sensors:
+            if sensor["device"] not in self.ads:
+                self.logger.error(f"ADC sensor '{sensor['app_id']}' skipped, device '{sensor['device']}' is not available")
+                continue
+            self.engine.add_channel(sensor["index"], sensor["device"], sensor["channel"], sensor.get("sample_rate", DEFAULT_SAMPLE_RATE))
+
+        self.engine.run(self._stop_event)
+
+    # Achieved sample rate per sensor
+    def stats(self):
+        if not self.engine:
+            return {}
+        rates = self.engine.stats()
+        return {
+            sensor["app_id"]: {**rates[sensor["index"]], "rejected": self.filters[sensor["index"]].rejected}
+            for sensor in self.sensors
+            if sensor["index"] in rates
+        }
 
 
     def read_settings(self):
-        self.sensor_data = self.read_sensor_data_from_json()
-
-        for i, (sensor_name, sensor_details) in enumerate(self.sensor_data["sensors"].items()):
-            channel = sensor_details["channel"]
-            analog_in_instance = AnalogIn(self.ads, getattr(ADS, channel))
-            self.channels.append(analog_in_instance)
-
-
-    def read_sensor(self):    
-        for i, (key, sensor) in enumerate(self.sensor_data["sensors"].items()):
-            voltage = self.channels[i].voltage
-            resistance = None
-
-            if sensor["ntc"]:
-                resistance = PULL_UP * voltage / (5 - voltage)
-
-            characteristics = sensor["characteristic"]
-            interpolated_value = self.interpolate_value(voltage, resistance, characteristics)
-            
-            
-            converted_value = eval(sensor["scale"], {"value": interpolated_value})
-
-            data = (f"{sensor['app_id']}:{float(converted_value)}")
-            self.emit_data_to_frontend(data)
-
-    def interpolate_value(self, voltage, resistance, characteristics):
-        interpolated_value = None
-        
-        # Calculate Value based on NTC characteristics
-        if resistance is not None:
-            closest_resistances = sorted(characteristics.keys(), key=lambda x: abs(float(x) - resistance))[:2]
-            value1, value2 = characteristics[closest_resistances[0]], characteristics[closest_resistances[1]]
-            interpolated_value = value1 + (value2 - value1) * (resistance - float(closest_resistances[0])) / (float(closest_resistances[1]) - float(closest_resistances[0]))
-            interpolated_value = round(interpolated_value / STEP) * STEP
-
-        # Calculate Value based on Voltage characteristics
-        else:
-            voltage_values = [float(key) for key in characteristics.keys()]
-            pressure_values = list(characteristics.values())
+        if self.sensor_data is None:
+            self.sensor_data = self.read_sensor_data_from_json()
+        devices = self.device_settings()
+
+        for sensor_name, sensor_details in self.sensor_data["sensors"].items():
+            try:
+                # validate and precompile scale calculation
+                convert = compile_scale(sensor_details["scale"])
 
-            # Find the two closest pairs
-            value1 = min(range(len(voltage_values)), key=lambda i: abs(voltage_values[i] - voltage))
-            value2 = max(range(len(voltage_values)), key=lambda i: abs(voltage_values[i] - voltage))
+                device = sensor_details.setdefault("device", next(iter(devices)))
+                if device not in devices:
+                    raise ValueError(f"device must be one of {', '.join(devices)}, not '{device}'")
 
-            # Linear interpolation
-            interpolated_value = pressure_values[value1] + (pressure_values[value2] - pressure_values[value1]) * (
-                voltage - voltage_values[value1]
-            ) / (voltage_values[value2] - voltage_values[value1])
-        
-        return interpolated_value
+                channel = sensor_details["channel"]
+                if channel not in INPUTS:
+                    raise ValueError(f"channel must be one of {', '.join(INPUTS)}, not '{channel}'")
+                if sensor_details.get("sample_rate", DEFAULT_SAMPLE_RATE) <= 0:
+                    raise ValueError("sample_rate must be positive")
+
+                sensor_filter = Filter.from_settings(sensor_details.get("filter"))
+
+                # sorted point table, interpolated together with the other sensors
+                index = self.characteristics.add(sensor_details["characteristic"])
+            except Exception as e:
+                self.logger.error(f"Error loading ADC sensor '{sensor_name}': {e}")
+                continue
+
+            # Record voltages into the session log when V-Link runs with --record
+            recorder_channel = None
+            if shared_state.recorder:
+                recorder_channel = shared_state.recorder.channel_index(f"adc:{sensor_details['app_id']}")
+
+            self.sensors.append({**sensor_details, "convert": convert, "recorder_channel": recorder_channel, "index": index})
+            self.filters.append(sensor_filter)
+
+        self.ntc = np.array([bool(sensor["ntc"]) for sensor in self.sensors], dtype=bool)  # stays a mask when empty
+        self.voltages = np.full(len(self.sensors), np.nan)
+
+    # Called by the acquisition engine for every conversion result
+    def store_sample(self, index, voltage):
+        self.filters[index].add(voltage)
+
+        sensor = self.sensors[index]
+        if sensor["recorder_channel"] is not None:
+            shared_state.recorder.append(KIND_ADC, sensor["recorder_channel"], time.time(), 0, 0, ADC_SAMPLE.pack(voltage))
+
+    # Called by the acquisition engine at the emit rate, emits one filtered value per sensor
+    def process_output(self):
+        for index, sensor_filter in enumerate(self.filters):
+            self.voltages[index] = sensor_filter.value()
+        self.process_voltages(self.voltages)
+
+    def read_from_replay(self):
+        session = shared_state.replay
+        sensors = {sensor["app_id"]: sensor for sensor in self.sensors}
+        self.logger.info(f"Replaying {len(session.adc)} ADC samples from recorded session...")
+
+        for timestamp, app_id, voltage in session.adc:
+            if not session.clock.wait_until(timestamp, self._stop_event):
+                break
+            if app_id in sensors:
+                sensor_filter = self.filters[sensors[app_id]["index"]]
+                sensor_filter.add(voltage)
+                self.process_voltage(sensors[app_id], sensor_filter.value())
+
+        self.logger.info("ADC replay finished.")
+
+    # Convert one voltage per sensor (array in self.sensors order) and hand the values to the batcher
+    def process_voltages(self, voltages):
+        inputs = np.array(voltages, dtype=np.float64)
+
+        # NTC sensors are looked up by resistance, a shorted or open input clamps to the table ends
+        with np.errstate(divide="ignore", invalid="ignore"):
+            inputs[self.ntc] = PULL_UP * inputs[self.ntc] / (SUPPLY_VOLTAGE - inputs[self.ntc])
+
+        values = self.characteristics.evaluate(inputs)
+        values[self.ntc] = np.round(values[self.ntc] / STEP) * STEP
+
+        for sensor, value in zip(self.sensors, values.tolist()):
+            if not math.isnan(value):  # not sampled yet
+                self.batcher.put(sensor["app_id"], float(sensor["convert"](value)))
+
+    # Convert a single voltage, used for replayed samples
+    def process_voltage(self, sensor, voltage):
+        if sensor["ntc"]:
+            resistance = PULL_UP * voltage / (SUPPLY_VOLTAGE - voltage) if voltage != SUPPLY_VOLTAGE else float("inf")
+            value = round(self.characteristics.evaluate_one(sensor["index"], resistance) / STEP) * STEP
+        else:
+            value = self.characteristics.evaluate_one(sensor["index"], voltage)
+
+        self.batcher.put(sensor["app_id"], float(sensor["convert"](value)))
 
     def read_sensor_data_from_json(self, filename="adc.json"):
         config_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config')
         file_path = os.path.join(config_folder, filename)
         with open(file_path, "r") as file:
             data = json.load(file)
-            return data
-
-    def connect_to_socketio(self):
-        max_retries = 5
-        current_retry = 0
-        while not self.client.connected and current_retry < max_retries:
-            try:
-                self.client.connect('http://localhost:4001', namespaces=['/adc'])
-                if(shared_state.verbose):
-                    if self.client.connected:
-                        self.logger.info("ADC connected to Socket.IO")
-                    else:
-                        self.logger.error("ADC failed to connect to Socket.IO.")
-            except Exception as e:
-                self.logger.error(f"ADCThread: Socket.IO connection failed. Retry {current_retry}/{max_retries}. Error: {e}")
-                time.sleep(2)
-                current_retry += 1
-
-    def emit_data_to_frontend(self, data):
-        if self.client and self.client.connected:
-            self.client.emit('data', data, namespace='/adc')
\ No newline at end of file
+            return data
\ No newline at end of file
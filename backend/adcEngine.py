@@ -0,0 +1,234 @@
+"""
+    Continuous-conversion acquisition for ADS1115/ADS1015 ADCs.
+
+    The chip runs in continuous mode at a fixed data rate, a conversion
+    completes every 1 / data_rate seconds. Switching the multiplexer to
+    another input restarts that cycle, the first result is only trusted after
+    `settle` conversions. Staying on one input yields a fresh result every
+    conversion period.
+
+    Each sensor declares its own sample rate in adc.json. The engine picks
+    the channel that is due next, switches the multiplexer only when needed
+    and reads the conversion register as soon as the conversion schedule says
+    a fresh result is ready, instead of sleeping a fixed time per read.
+
+    Several ADS1115/ADS1015 at different addresses share one I2C bus. Every
+    chip has its own schedule and the engine interleaves their bus
+    transactions, so all chips convert at the same time.
+"""
+
+import time
+
+# Register pointers and config bits, see the ADS1115 datasheet
+POINTER_CONVERSION = 0x00
+POINTER_CONFIG = 0x01
+CONFIG_MODE_CONTINUOUS = 0x0000
+CONFIG_COMP_QUE_DISABLE = 0x0003
+MUX_SHIFT = 12
+
+GAINS = {2 / 3: 0x0000, 1: 0x0200, 2: 0x0400, 4: 0x0600, 8: 0x0800, 16: 0x0A00}
+FULL_SCALE = {2 / 3: 6.144, 1: 4.096, 2: 2.048, 4: 1.024, 8: 0.512, 16: 0.256}  # volts
+
+DATA_RATES = {
+    "ADS1115": {8: 0x0000, 16: 0x0020, 32: 0x0040, 64: 0x0060, 128: 0x0080, 250: 0x00A0, 475: 0x00C0, 860: 0x00E0},
+    "ADS1015": {128: 0x0000, 250: 0x0020, 490: 0x0040, 920: 0x0060, 1600: 0x0080, 2400: 0x00A0, 3300: 0x00C0},
+}
+
+# Multiplexer settings by input name, single ended or differential
+INPUTS = {
+    "P0": 0x4, "P1": 0x5, "P2": 0x6, "P3": 0x7,
+    "P0-P1": 0x0, "P0-P3": 0x1, "P1-P3": 0x2, "P2-P3": 0x3,
+}
+
+CLOCK_TOLERANCE = 1.1   # the internal oscillator may run up to 10% slow
+SETTLE_CONVERSIONS = 2  # conversions to wait after switching the multiplexer
+
+
+class ADS1x15:
+    """Register-level access to one ADS1115/ADS1015 running in continuous mode."""
+
+    def __init__(self, i2c, address=0x48, model="ADS1115", data_rate=860, gain=1):
+        # imported here so the engine itself does not need the Blinka stack
+        from adafruit_bus_device.i2c_device import I2CDevice
+
+        if model not in DATA_RATES:
+            raise ValueError(f"model must be one of {', '.join(DATA_RATES)}, not '{model}'")
+        if data_rate not in DATA_RATES[model]:
+            raise ValueError(f"{model} data rate must be one of {', '.join(map(str, DATA_RATES[model]))}, not {data_rate}")
+        if gain not in GAINS:
+            raise ValueError(f"gain must be one of {', '.join(f'{gain:g}' for gain in GAINS)}, not {gain}")
+
+        self.device = I2CDevice(i2c, address)
+        self.address = address
+        self.model = model
+        self.data_rate = data_rate
+        self.period = CLOCK_TOLERANCE / data_rate
+        self.scale = FULL_SCALE[gain] / 32768  # results are left aligned 16 bit values on both models
+
+        self._config = CONFIG_MODE_CONTINUOUS | GAINS[gain] | DATA_RATES[model][data_rate] | CONFIG_COMP_QUE_DISABLE
+        self._buffer = bytearray(3)
+
+    def select(self, mux):
+        """Switch the multiplexer, the chip restarts its conversion cycle."""
+        config = self._config | (mux << MUX_SHIFT)
+        self._buffer[0] = POINTER_CONFIG
+        self._buffer[1] = config >> 8
+        self._buffer[2] = config & 0xFF
+        with self.device as i2c:
+            i2c.write(self._buffer)
+
+    def read(self):
+        """Voltage of the last completed conversion."""
+        with self.device as i2c:
+            i2c.write_then_readinto(bytes((POINTER_CONVERSION,)), self._buffer, in_end=2)
+        return int.from_bytes(self._buffer[:2], "big", signed=True) * self.scale
+
+
+class Channel:
+    """A sensor input sampled at its own rate."""
+
+    __slots__ = ("index", "mux", "rate", "period", "next_due", "samples", "first_sample", "last_sample")
+
+    def __init__(self, index, mux, rate):
+        self.index = index
+        self.mux = mux
+        self.rate = rate
+        self.period = 1.0 / rate
+        self.next_due = 0.0
+        self.samples = 0
+        self.first_sample = None
+        self.last_sample = None
+
+    def achieved_rate(self):
+        if self.samples < 2:
+            return None
+        return (self.samples - 1) / (self.last_sample - self.first_sample)
+
+
+class Converter:
+    """Conversion schedule of one ADC chip.
+
+    A conversion is started when the next channel is due (switching the
+    multiplexer if needed) and read once it is ready. In between the engine
+    is free to service the other chips on the bus.
+    """
+
+    def __init__(self, name, device, settle):
+        self.name = name
+        self.device = device
+        self.settle = settle
+        self.channels = []
+
+        self.mux = None
+        self.selected_at = 0.0      # start of the conversion cycle on the current input
+        self.conversion = 0         # number of the last conversion read since then
+
+        self.pending = None         # channel whose conversion is running
+        self.ready_at = 0.0
+
+    def next_event(self):
+        if self.pending:
+            return self.ready_at
+        return min(channel.next_due for channel in self.channels)
+
+    def step(self, on_sample):
+        """Start the conversion of the channel due next, or read the running one."""
+        if self.pending is None:
+            self.pending = min(self.channels, key=lambda channel: channel.next_due)
+            self.ready_at = self._ready_at(self.pending.mux)
+            return
+
+        channel, self.pending = self.pending, None
+        voltage = self.device.read()
+        now = time.monotonic()
+        self.conversion = int((now - self.selected_at) / self.device.period + 1e-6)
+
+        channel.samples += 1
+        if channel.first_sample is None:
+            channel.first_sample = now
+        channel.last_sample = now
+        channel.next_due += channel.period
+        if channel.next_due < now:
+            channel.next_due = now  # fell behind, don't burst to catch up
+
+        on_sample(channel.index, voltage)
+
+    def _ready_at(self, mux):
+        """Time at which a fresh conversion of `mux` can be read, switching the multiplexer if needed."""
+        if mux != self.mux:
+            self.device.select(mux)
+            self.mux = mux
+            self.selected_at = time.monotonic()
+            self.conversion = self.settle - 1
+        return self.selected_at + (self.conversion + 1) * self.device.period
+
+
+class AcquisitionEngine:
+    """Schedules the conversions of all ADC chips and hands every result to `on_sample(index, voltage)`.
+
+    The chips share one I2C bus but convert in parallel: while one waits for
+    its conversion the engine starts or reads conversions on the others.
+    run() blocks until `stop_event` is set, `on_output()` is called every
+    `output_interval` seconds in between samples.
+    """
+
+    def __init__(self, devices, on_sample, on_output=None, output_interval=None, settle=SETTLE_CONVERSIONS):
+        self.converters = {name: Converter(name, device, settle) for name, device in devices.items()}
+        self.on_sample = on_sample
+        self.on_output = on_output
+        self.output_interval = output_interval
+
+    def add_channel(self, index, device, input_name, rate):
+        if device not in self.converters:
+            raise ValueError(f"device must be one of {', '.join(self.converters)}, not '{device}'")
+        if input_name not in INPUTS:
+            raise ValueError(f"channel must be one of {', '.join(INPUTS)}, not '{input_name}'")
+        if rate <= 0:
+            raise ValueError(f"sample_rate must be positive, not {rate}")
+        self.converters[device].channels.append(Channel(index, INPUTS[input_name], rate))
+
+    def run(self, stop_event):
+        converters = [converter for converter in self.converters.values() if converter.channels]
+        if not converters:
+            stop_event.wait()
+            return
+
+        now = time.monotonic()
+        next_output = now + (self.output_interval or 0)
+        for converter in converters:
+            for channel in converter.channels:
+                channel.next_due = now
+
+        while not stop_event.is_set():
+            converter = min(converters, key=Converter.next_event)
+            event = converter.next_event()
+
+            if self.on_output and next_output <= event:
+                if not self._wait_until(next_output, stop_event):
+                    break
+                self.on_output()
+                next_output = max(next_output + self.output_interval, time.monotonic())
+                continue
+
+            if not self._wait_until(event, stop_event):
+                break
+            converter.step(self.on_sample)
+
+    def _wait_until(self, deadline, stop_event):
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            return not stop_event.wait(delay)
+        return not stop_event.is_set()
+
+    def stats(self):
+        """Device, target and achieved samples/s per channel index."""
+        return {
+            channel.index: {
+                "device": converter.name,
+                "rate": channel.rate,
+                "achieved": round(channel.achieved_rate(), 1) if channel.achieved_rate() else None,
+                "samples": channel.samples,
+            }
+            for converter in self.converters.values()
+            for channel in converter.channels
+        }
@@ -1,10 +1,22 @@
 import time
 import uinput
+from collections import deque
 from enum import Enum, auto
 from .shared.shared_state import shared_state
 
+LATENCY_SAMPLES = 1000  # input-to-uinput latencies kept for the statistic
+MOUSE_BASE_RATE = 10    # mouse_speed is in pixels per 1/MOUSE_BASE_RATE seconds at the start of a movement
+
+JOYSTICK_DIRECTIONS = {
+    "BTN_UP": (0, -1),
+    "BTN_DOWN": (0, 1),
+    "BTN_LEFT": (-1, 0),
+    "BTN_RIGHT": (1, 0),
+}
+
 def current_time_ms():
-    return int(time.time() * 1000)
+    # monotonic, so press durations are not affected by clock changes
+    return time.monotonic() * 1000
 
 def time_elapsed(start_time):
     return current_time_ms() - start_time
@@ -20,12 +32,23 @@ class JoystickState(Enum):
     MOVING = auto()
 
 class ButtonHandler:
-    def __init__(self, click_timeout, long_press_duration, mouse_speed):
+    def __init__(self, click_timeout, long_press_duration, mouse_speed,
+                 mouse_rate=120, mouse_acceleration=1.5, mouse_max_factor=4.0):
         self.click_timeout = click_timeout
         self.long_press_duration = long_press_duration
         self.mouse_speed = mouse_speed
         self.mouse_mode = False
 
+        # Mouse motion: steps per second, speed gain per second held and the maximum gain
+        self.mouse_interval = 1000 / mouse_rate
+        self.mouse_acceleration = mouse_acceleration
+        self.mouse_max_factor = mouse_max_factor
+        self.motion = None              # (dx, dy) while a direction is held in mouse mode
+        self.motion_started_at = 0
+        self.motion_seen_at = 0
+        self.next_motion_at = 0
+        self.motion_remainder = [0.0, 0.0]
+
         self.button_state = ButtonState.IDLE
         self.joystick_state = JoystickState.IDLE
         self.current_button = None
@@ -34,6 +57,9 @@ class ButtonHandler:
         self.long_press_executed = False
         self.last_joystick_at = 0
 
+        self.emits = 0
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)
+
         self.input_device = uinput.Device([
             uinput.REL_X,        # Relative X axis (horizontal movement)
             uinput.REL_Y,        # Relative Y axis (vertical movement)
@@ -49,10 +75,67 @@ class ButtonHandler:
             uinput.KEY_RIGHT
         ])
 
-    def handle(self, button_name):
+    def handle(self, button_name, received_at=None):
+        """Handle a control frame, `received_at` (time.monotonic) is used for the latency statistic."""
+        emits = self.emits
         self._handle_buttons(button_name)
         self._handle_joystick(button_name)
 
+        if received_at is not None and self.emits != emits:
+            self.latencies.append(time.monotonic() - received_at)
+
+    def poll(self):
+        """Fire mouse steps, long-press and release transitions that are due, independent of incoming frames."""
+        now = current_time_ms()
+        if self.motion and now >= self.next_motion_at:
+            if now - self.motion_seen_at >= self.click_timeout:
+                self.motion = None  # no frame for click_timeout, the release frame was lost
+            else:
+                self._motion_step(now)
+
+        if not self.current_button:
+            return
+
+        release_at = self.last_button_at + self.click_timeout
+        if self.button_state == ButtonState.PRESSED and self.button_down_at + self.long_press_duration <= min(now, release_at):
+            self._check_long_press(self.current_button, now)
+
+        if now >= release_at:
+            self._release_button(self.current_button, time_elapsed(self.button_down_at))
+
+    def next_deadline(self):
+        """Monotonic time (ms) of the next mouse step, long-press or release transition, None if idle."""
+        deadlines = []
+        if self.motion:
+            deadlines.append(self.next_motion_at)
+
+        if self.current_button:
+            deadlines.append(self.last_button_at + self.click_timeout)
+            if self.button_state == ButtonState.PRESSED and not self.long_press_executed:
+                deadlines.append(self.button_down_at + self.long_press_duration)
+
+        return min(deadlines) if deadlines else None
+
+    def latency_stats(self):
+        """Input-to-uinput latency in ms over the last LATENCY_SAMPLES inputs that emitted events."""
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return {
+            "count": len(ordered),
+            "p50_ms": round(ordered[len(ordered) // 2] * 1000, 2),
+            "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000, 2),
+            "max_ms": round(ordered[-1] * 1000, 2),
+        }
+
+    def _emit(self, event, value):
+        self.input_device.emit(event, value)
+        self.emits += 1
+
+    def _click(self, key):
+        self.input_device.emit_click(key, 1)
+        self.emits += 1
+
     def _handle_buttons(self, button_name):
         if not button_name:
             if self.button_state != ButtonState.IDLE:
@@ -70,9 +153,11 @@ class ButtonHandler:
             self.button_down_at = now
 
         self.last_button_at = now
+        self._check_long_press(button_name, now)
 
+    def _check_long_press(self, button_name, now):
         # Trigger long press action if duration is exceeded and not already triggered
-        if self.button_state == ButtonState.PRESSED and time_elapsed(self.button_down_at) > self.long_press_duration:
+        if self.button_state == ButtonState.PRESSED and now - self.button_down_at >= self.long_press_duration:
             self.button_state = ButtonState.LONG_PRESSED
             if not self.long_press_executed:  # Trigger only once
                 print("test")
@@ -88,20 +173,20 @@ class ButtonHandler:
                 print('Enter')
                 if self.mouse_mode:
                     print('Left mouse click')
-                    self.input_device.emit(uinput.BTN_LEFT, 1)
-                    self.input_device.emit(uinput.BTN_LEFT, 0)
+                    self._emit(uinput.BTN_LEFT, 1)
+                    self._emit(uinput.BTN_LEFT, 0)
                 else:
                     print('Spacebar')
-                    self.input_device.emit_click(uinput.KEY_SPACE, 1)
+                    self._click(uinput.KEY_SPACE)
             case "BTN_BACK":
                 print('Back')
-                self.input_device.emit_click(uinput.KEY_BACKSPACE, 1)
+                self._click(uinput.KEY_BACKSPACE)
             case "BTN_NEXT":
                 print('Next')
-                self.input_device.emit_click(uinput.KEY_N, 1)
+                self._click(uinput.KEY_N)
             case "BTN_PREV":
                 print('Previous')
-                self.input_device.emit_click(uinput.KEY_V, 1)
+                self._click(uinput.KEY_V)
             case "BTN_VOL_UP":
                 print('Volume up')
             case "BTN_VOL_DOWN":
@@ -121,7 +206,7 @@ class ButtonHandler:
 
     def _release_button(self, button_name, press_duration):
         """Reset button state and ensure no redundant long-press actions."""
-        print(f"Button released: {button_name} after {press_duration}ms")
+        print(f"Button released: {button_name} after {press_duration:.0f}ms")
 
         if self.long_press_executed:
             print(f"Long press action already handled for {button_name}, skipping.")
@@ -135,30 +220,25 @@ class ButtonHandler:
 
     def timeout_button(self):
         """Automatically release a button if it exceeds the click timeout."""
-        if self.current_button and time_elapsed(self.last_button_at) > self.click_timeout:
+        if self.current_button and time_elapsed(self.last_button_at) >= self.click_timeout:
             self._release_button(self.current_button, time_elapsed(self.button_down_at))
 
     def _handle_joystick(self, joystick_name):
         """Handle joystick actions based on the current mode (mouse or keyboard)."""
         now = current_time_ms()
 
-        # If no joystick input, reset state but don't reset the timeout
+        # Release (or no joystick input): stop motion now, but don't reset the keyboard timeout
         if not joystick_name:
             self.joystick_state = JoystickState.IDLE
             self.current_joystick_button = None
+            self.motion = None
             return
 
-        # Mouse mode: Continuous movement
+        # Mouse mode: continuous movement driven by poll() while the direction is held
         if self.mouse_mode:
-            match joystick_name:
-                case "BTN_UP":
-                    self._move_mouse(0, -1)
-                case "BTN_DOWN":
-                    self._move_mouse(0, 1)
-                case "BTN_LEFT":
-                    self._move_mouse(-1, 0)
-                case "BTN_RIGHT":
-                    self._move_mouse(1, 0)
+            direction = JOYSTICK_DIRECTIONS.get(joystick_name)
+            if direction:
+                self._hold_motion(direction, now)
             return
         
         # Enforce click timeout for keyboard mode
@@ -171,19 +251,47 @@ class ButtonHandler:
         # Perform single key press for keyboard mode
         match joystick_name:
             case "BTN_UP":
-                self.input_device.emit_click(uinput.KEY_UP, 1)
+                self._click(uinput.KEY_UP)
             case "BTN_DOWN":
-                self.input_device.emit_click(uinput.KEY_H, 1)
+                self._click(uinput.KEY_H)
             case "BTN_LEFT":
-                self.input_device.emit_click(uinput.KEY_LEFT, 1)
+                self._click(uinput.KEY_LEFT)
             case "BTN_RIGHT":
-                self.input_device.emit_click(uinput.KEY_RIGHT, 1)
+                self._click(uinput.KEY_RIGHT)
+
+    def _hold_motion(self, direction, now):
+        self.motion_seen_at = now
+        if direction == self.motion:
+            return
+
+        # New direction: start slow again and move right away
+        self.motion = direction
+        self.motion_started_at = now
+        self.motion_remainder = [0.0, 0.0]
+        self.next_motion_at = now
+        self._motion_step(now)
+
+    def _motion_step(self, now):
+        held = (now - self.motion_started_at) / 1000
+        factor = min(self.mouse_max_factor, 1 + self.mouse_acceleration * held)
+        step = self.mouse_speed * MOUSE_BASE_RATE * factor * self.mouse_interval / 1000
 
-    def _move_mouse(self, dx, dy):
-        scaled_dx = int(dx * self.mouse_speed)
-        scaled_dy = int(dy * self.mouse_speed)
+        # Keep the fractions, so slow movements still add up to whole pixels
+        moves = []
+        for axis, (event, delta) in enumerate(((uinput.REL_X, self.motion[0]), (uinput.REL_Y, self.motion[1]))):
+            self.motion_remainder[axis] += delta * step
+            pixels = int(self.motion_remainder[axis])
+            if pixels:
+                self.motion_remainder[axis] -= pixels
+                moves.append((event, pixels))
 
-        self.input_device.emit(uinput.REL_X, scaled_dx)
-        self.input_device.emit(uinput.REL_Y, scaled_dy)
+        # One SYN_REPORT for both axes
+        for event, pixels in moves:
+            self.input_device.emit(event, pixels, syn=False)
+        if moves:
+            self.input_device.syn()
+            self.emits += 1
 
-        print(f"Moving mouse, dx={scaled_dx}, dy={scaled_dy}, speed={self.mouse_speed}")
\ No newline at end of file
+        self.next_motion_at += self.mouse_interval
+        if self.next_motion_at < now:
+            self.next_motion_at = now + self.mouse_interval  # fell behind, don't burst to catch up
\ No newline at end of file
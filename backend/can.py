@@ -1,18 +1,22 @@
 import threading
 import time
 import can
-import socketio
 import sys
 from . import settings
-from .buttonHandler import ButtonHandler
+from .input import post_input
+from .canScheduler import DiagnosticScheduler, format_latency_report
+from .canSignal import compile_extractor, build_broadcast_table
+from .recorder import FrameLog, CANRecorder
 from .shared.shared_state import shared_state
+from .shared.scale import compile_scale
+from .shared.batcher import DataBatcher
 
 
 class Config:
-    def __init__(self, logger):
+    def __init__(self, logger, can_settings=None):
         self.logger = logger
 
-        self.can_settings = settings.load_settings("can")
+        self.can_settings = can_settings or settings.load_settings("can")
         self.interfaces = []
         self.sensors = {}
 
@@ -40,6 +44,11 @@ class Config:
                 if iface not in self.sensors:
                     self.sensors[iface] = []
 
+                if sensor['type'] == "broadcast":
+                    self.sensors[iface].append(self.load_broadcast_sensor(sensor))
+                    self.logger.debug(f"Loaded broadcast sensor '{key}' on {iface}")
+                    continue
+
                 req_id = int(sensor['req_id'], 16)
                 rep_id = int(sensor['rep_id'], 16)
                 target = int(sensor['target'], 16)
@@ -56,19 +65,21 @@ class Config:
                 refresh_rate = sensor.get('refresh_rate', 0.5)
                 scale = sensor["scale"]
 
-                # check scale calculation
-                if not isinstance(scale, str) or "value" not in scale:
-                    raise ValueError(f"Invalid scale format for sensor {key}")
+                # validate and precompile scale calculation
+                convert = compile_scale(scale)
 
                 self.sensors[iface].append({
                     "type": sensor['type'],
                     "req_id": [req_id],
                     "rep_id": [rep_id],
                     "message_bytes": message_bytes,
+                    "action": action,
                     "scale": scale,
+                    "convert": convert,
                     "is_16bit": sensor['is_16bit'],
                     "id": sensor['app_id'],
                     "refresh_rate": refresh_rate,
+                    "deadband": sensor.get("deadband"),
                     "last_requested_time": 0
                 })
 
@@ -76,6 +87,42 @@ class Config:
             except Exception as e:
                 self.logger.error(f"Error loading sensor '{key}': {e}")
 
+    def load_broadcast_sensor(self, sensor):
+        # Passively decoded signal, rep_id is the id of the broadcast frame
+        extract, min_length = compile_extractor(
+            int(sensor["start_bit"]),
+            int(sensor["length"]),
+            sensor.get("byte_order", "little_endian"),
+            bool(sensor.get("signed", False)),
+            float(sensor.get("factor", 1)),
+            float(sensor.get("offset", 0)),
+        )
+
+        return {
+            "type": "broadcast",
+            "rep_id": [int(sensor['rep_id'], 16)],
+            "extract": extract,
+            "min_length": min_length,
+            "id": sensor['app_id'],
+            "deadband": sensor.get("deadband"),
+        }
+
+
+def build_dispatch_table(sensors, logger):
+    """Index diagnostic sensors by (rep_id, parameter0, parameter1) so a reply costs one dict lookup."""
+    dispatch = {}
+    for sensor in sensors:
+        if sensor.get("type") != "diagnostic":
+            continue
+
+        key = (sensor["rep_id"][0], sensor["message_bytes"][3], sensor["message_bytes"][4])
+        if key in dispatch:
+            logger.warning(f"Sensor {sensor['id']} shares reply id and parameter with {dispatch[key]['id']}, ignoring it")
+            continue
+        dispatch[key] = sensor
+    return dispatch
+
+
 class CANThread(threading.Thread):
     def __init__(self, logger):
         super(CANThread, self).__init__()
@@ -84,17 +131,22 @@ class CANThread(threading.Thread):
         self._stop_event = threading.Event()
         self.daemon = True
 
-        self.client = socketio.Client()
         self.config = Config(logger)
         self.can_control_settings = self.config.can_settings["controls"]
+        self.batcher = DataBatcher("/can", self.config.can_settings.get("emit_rate", 30), datalog=shared_state.datalog)
+        for sensors in self.config.sensors.values():
+            for sensor in sensors:
+                self.batcher.set_deadband(sensor["id"], sensor["deadband"])
 
         self.can_buses = {}         # can interfaces
         self.notifiers = {}         # can filters (using a callback)
-        self.broadcast_tasks = []   # scheduled tasks to send can messages
+        self.schedulers = {}        # diagnostic request schedulers per interface
+        self.frame_log = None       # raw frame recorder (optional)
 
         
     def run(self):
-        self.connect_to_socketio()
+        self.batcher.start()
+        self.start_recorder()
         self.initialize_canbus()
         
         try:
@@ -103,6 +155,29 @@ class CANThread(threading.Thread):
         except KeyboardInterrupt:
             pass
 
+    def start_recorder(self):
+        # Record into the session log when V-Link runs with --record
+        if shared_state.recorder:
+            self.frame_log = shared_state.recorder
+            return
+
+        recorder_settings = self.config.can_settings.get("recorder", {})
+        if not recorder_settings.get("enabled"):
+            return
+
+        try:
+            self.frame_log = FrameLog(
+                recorder_settings.get("directory", "~/v-link/logs/can"),
+                max_file_size=recorder_settings.get("max_file_size", 32 * 1024 * 1024),
+                max_files=recorder_settings.get("max_files", 20),
+                logger=self.logger
+            )
+            self.frame_log.start()
+            self.logger.info(f"Recording CAN frames to {self.frame_log.directory}")
+        except Exception as e:
+            self.logger.error(f"Error starting CAN recorder: {e}")
+            self.frame_log = None
+
     def initialize_canbus(self):
         for iface in self.config.interfaces:
             channel = iface["channel"] # can1, can2, etc
@@ -111,7 +186,7 @@ class CANThread(threading.Thread):
             try:
                 bus = can.interface.Bus(
                     channel=channel,
-                    bustype=iface["bustype"],
+                    bustype="virtual" if shared_state.replay else iface["bustype"],  # frames come from ReplayThread
                     bitrate=iface["bitrate"]
                 )
                 if bus is None:
@@ -138,42 +213,57 @@ class CANThread(threading.Thread):
                     except ValueError as e:
                         self.logger.error(f"Invalid control rep_id for channel {channel}: {e}")
 
-                # Set up filters for all reply_ids
-                filters = [{"can_id": rep_id, "can_mask": 0x1FFFFFFF if is_extended else 0x7FF, "extended": is_extended} for rep_id in rep_ids]
-                bus.set_filters(filters)
-
-                # Configure scheduled tasks to send diagnostic CAN requests
-                filtered_sensors = [sensor for sensor in sensors if sensor.get("type") == "diagnostic"]
-                for sensor in filtered_sensors:
-                    msg = can.Message(
-                        arbitration_id=sensor["req_id"][0],
-                        data=sensor["message_bytes"],
-                        is_extended_id=is_extended
-                    )
-                    period = sensor.get("refresh_rate", 1) # default to 1 second if not supplied
-
-                    task = bus.send_periodic(msg, period=period)
-                    self.broadcast_tasks.append(task) # save task to list to prevent it being gc'ed
-                    
-                    #self.logger.debug(f"Created scheduled task for sensor {sensor['id']}")
-
-                sensors_by_id = {}
-                for sensor in sensors:
-                    rep_id = sensor["rep_id"][0]
-                    sensors_by_id.setdefault(rep_id, []).append(sensor)
+                # Set up filters for all reply_ids, unless the recorder should capture all traffic
+                if not (self.frame_log and self.config.can_settings.get("recorder", {}).get("capture_all")):
+                    filters = [{"can_id": rep_id, "can_mask": 0x1FFFFFFF if is_extended else 0x7FF, "extended": is_extended} for rep_id in rep_ids]
+                    bus.set_filters(filters)
+
+                # Configure scheduler to send diagnostic CAN requests, replayed sessions already contain the replies
+                scheduler = None
+                if not shared_state.replay:
+                    scheduler = DiagnosticScheduler(bus, sensors, is_extended, self.config.can_settings.get("scheduler", {}), self.logger)
+
+                dispatch = build_dispatch_table(sensors, self.logger)
+                broadcast = build_broadcast_table(sensors, self.logger)
 
                 self.logger.debug("Starting CAN Notifier")
 
-                listener = CANListener(sensors_by_id, self.can_control_settings, self.client, self.logger)
-                notifier = can.Notifier(bus, [listener])
+                listener = CANListener(dispatch, self.can_control_settings, self.batcher, self.logger, scheduler, broadcast)
+                listeners = [listener]
+                if self.frame_log:
+                    listeners.append(CANRecorder(self.frame_log, channel))
+
+                notifier = can.Notifier(bus, listeners)
                 self.notifiers[channel] = notifier
 
+                if scheduler:
+                    scheduler.start()
+                    self.schedulers[channel] = scheduler
+
             except Exception as e:
                 self.logger.error(f"Error initializing CAN Bus {channel}: {e}")
 
+    def latency_stats(self):
+        """Round-trip latency statistics of all diagnostic sensors, keyed by app_id."""
+        report = {}
+        for scheduler in self.schedulers.values():
+            report.update(scheduler.stats())
+        return report
+
     def stop_thread(self):
         time.sleep(.5)
         self._stop_event.set()
+        self.batcher.stop()
+        for app_id, counts in self.batcher.stats().items():
+            self.logger.info(f"CAN {app_id}: {counts['emitted']} updates emitted, {counts['suppressed']} suppressed")
+
+        latency = self.latency_stats()
+        if latency:
+            self.logger.info("CAN request latency:\n" + format_latency_report(latency))
+
+        for scheduler in self.schedulers.values():
+            scheduler.stop()
+
         for notifier in self.notifiers.values():
             try:
                 notifier.stop()
@@ -184,32 +274,18 @@ class CANThread(threading.Thread):
             bus.stop_all_periodic_tasks()
             bus.shutdown()
 
-        if self.client.connected:
-            self.client.disconnect()
-
-    def connect_to_socketio(self):
-        max_retries = 10
-        current_retry = 0
-        while not self.client.connected and current_retry < max_retries:
-            try:
-                self.client.connect('http://localhost:4001', namespaces=['/can'])
-            except Exception as e:
-                self.logger.error(f"Socket.IO connection failed. Retry {current_retry}/{max_retries}. Error: {e}")
-                time.sleep(.5)
-                current_retry += 1
-
-        if self.client.connected:
-            self.logger.info(f"CAN connected to Socket.IO")
-        else:
-            self.logger.error(f"CAN failed to connect to Socket.IO.")
+        if self.frame_log and self.frame_log is not shared_state.recorder:
+            self.frame_log.close()
 
 class CANListener(can.Listener):
-    def __init__(self, sensors_by_id, control_settings, client, logger):
+    def __init__(self, dispatch, control_settings, batcher, logger, scheduler=None, broadcast=None):
         self.logger = logger
 
-        self.sensors_by_id = sensors_by_id
+        self.dispatch = dispatch
+        self.broadcast = broadcast or {}
         self.control_settings = control_settings
-        self.client = client
+        self.batcher = batcher
+        self.scheduler = scheduler
 
         # Control parameters
         self.zero_message = [int(byte, 16) for byte in control_settings['zero_message']]
@@ -218,17 +294,15 @@ class CANListener(can.Listener):
         self.control_buttons = {k: self.parse_can_control_values(v) for k, v in control_settings['button'].items()}
         self.control_joystick = {k: self.parse_can_control_values(v) for k, v in control_settings['joystick'].items()}
 
+        # Set while a control is held, so the release is posted once
+        self.control_held = False
+
         # Build lookup from control message tuple to button name
         self.control_lookup = {}
         for button_name, value_lists in {**self.control_buttons, **self.control_joystick}.items():
             for key_tuple in value_lists:
                 self.control_lookup[key_tuple] = button_name
 
-        self.button_handler = ButtonHandler(
-            control_settings['click_timeout'],
-            control_settings['long_press_duration'],
-            control_settings['mouse_speed']
-        )
 
     def parse_can_control_values(self, value):
         if isinstance(value[0], list):
@@ -240,38 +314,51 @@ class CANListener(can.Listener):
 
     def on_message_received(self, msg):
         try:
-            if msg.arbitration_id in self.sensors_by_id:
-                data = list(msg.data)
-                if shared_state.verbose:
-                    message_hex = " ".join(f"{byte:02X}" for byte in msg.data)
-                    self.logger.debug(f"Parsing message: {message_hex}")
-
-                for sensor in self.sensors_by_id[msg.arbitration_id]:
-                    if (data[2] != sensor['message_bytes'][2] and  # Exclude request message (0xA6)
-                        data[3] == sensor["message_bytes"][3] and  # match parameter0
-                        data[4] == sensor["message_bytes"][4]):    # match parameter1
-
-                        value = ((data[5] << 8) | data[6] if sensor["is_16bit"] else data[5])
-                        converted_value = eval(sensor["scale"], {"value": value})
-
+            data = msg.data
+
+            # Broadcast frames can carry several signals
+            signals = self.broadcast.get(msg.arbitration_id)
+            if signals is not None:
+                for sensor, extract, min_length in signals:
+                    if msg.dlc >= min_length:
+                        self.batcher.put(sensor["id"], float(extract(data)))
+                return
+
+            if msg.dlc > 6:
+                # Match reply id and parameter0/1 in one lookup
+                key = (msg.arbitration_id, data[3], data[4])
+                sensor = self.dispatch.get(key)
+
+                if sensor is not None and data[2] != sensor["action"]:  # Exclude request message (0xA6)
+                    if self.scheduler:
+                        self.scheduler.on_reply(key)
+
+                    value = ((data[5] << 8) | data[6] if sensor["is_16bit"] else data[5])
+                    converted_value = sensor["convert"](value)
+
+                    if shared_state.verbose:
+                        message_hex = " ".join(f"{byte:02X}" for byte in data)
+                        self.logger.debug(f"Parsing message: {message_hex}")
                         self.logger.debug(f"Sending message for {sensor['id']} to frontend with value {converted_value}")
 
-                        if self.client and self.client.connected:
-                            self.client.emit("data", f"{sensor['id']}:{float(converted_value)}", namespace="/can")
-                        return  # Process only one sensor per message
+                    self.batcher.put(sensor["id"], float(converted_value))
+                    return  # Process only one sensor per message
 
-            # Process control messages if enabled
+            # Process control messages if enabled, the input thread does the rest
             if self.control_settings['enabled'] and msg.arbitration_id == self.control_reply_id:
                 message_data = list(msg.data)
-                self.button_handler.timeout_button()
                 if message_data[-len(self.zero_message):] == self.zero_message:
-                    self.logger.debug("Zero message detected. Ignoring CAN Frame.")
+                    # Controls released, stops mouse motion right away
+                    if self.control_held:
+                        self.control_held = False
+                        post_input("can", None)
                     return
 
                 key = tuple(message_data[-self.control_byte_count:])
                 if key in self.control_lookup:
                     self.logger.debug(f"Pressing: {self.control_lookup[key]}")
-                    self.button_handler.handle(self.control_lookup[key])
+                    self.control_held = True
+                    post_input("can", self.control_lookup[key])
                     return
 
                 message_hex = " ".join(f"{byte:02X}" for byte in message_data)
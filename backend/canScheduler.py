@@ -0,0 +1,254 @@
+import bisect
+import threading
+import time
+import can
+
+MAX_BACKOFF = 8.0       # slowest rate multiplier applied to a struggling ECU
+BACKOFF_STEP = 1.5      # multiplier applied on every timeout
+RECOVERY_STEP = 0.95    # multiplier applied on every reply until back at 1.0
+
+# Upper bounds of the round-trip latency histogram buckets (seconds), the last bucket collects the rest
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5)
+
+
+class LatencyStats:
+    """Round-trip latency histogram, timeout count and achieved refresh period of one sensor."""
+
+    __slots__ = ("buckets", "replies", "timeouts", "total", "min", "max", "first_reply", "last_reply")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.replies = 0
+        self.timeouts = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+        self.first_reply = None
+        self.last_reply = None
+
+    def add_reply(self, rtt, now):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, rtt)] += 1
+        self.replies += 1
+        self.total += rtt
+        self.min = rtt if self.min is None else min(self.min, rtt)
+        self.max = rtt if self.max is None else max(self.max, rtt)
+        if self.first_reply is None:
+            self.first_reply = now
+        self.last_reply = now
+
+    def percentile(self, point):
+        """Upper bound of the bucket holding the given percentile, None if it is in the overflow bucket."""
+        if not self.replies:
+            return None
+        rank = self.replies * point / 100
+        count = 0
+        for bound, bucket in zip(LATENCY_BUCKETS, self.buckets):
+            count += bucket
+            if count >= rank:
+                return bound
+        return None
+
+    def as_dict(self):
+        def ms(seconds):
+            return round(seconds * 1000, 2) if seconds is not None else None
+
+        achieved = None
+        if self.replies > 1:
+            achieved = (self.last_reply - self.first_reply) / (self.replies - 1)
+
+        labels = [f"<={ms(bound):g}ms" for bound in LATENCY_BUCKETS] + [f">{ms(LATENCY_BUCKETS[-1]):g}ms"]
+        return {
+            "replies": self.replies,
+            "timeouts": self.timeouts,
+            "mean_ms": ms(self.total / self.replies) if self.replies else None,
+            "min_ms": ms(self.min),
+            "max_ms": ms(self.max),
+            "p50_ms": ms(self.percentile(50)),
+            "p90_ms": ms(self.percentile(90)),
+            "p99_ms": ms(self.percentile(99)),
+            "achieved_period": round(achieved, 4) if achieved is not None else None,
+            "histogram": dict(zip(labels, self.buckets)),
+        }
+
+
+class DiagnosticRequest:
+    """A diagnostic sensor as seen by the scheduler."""
+
+    def __init__(self, sensor, is_extended, now):
+        self.sensor = sensor
+        self.key = (sensor["rep_id"][0], sensor["message_bytes"][3], sensor["message_bytes"][4])
+        self.msg = can.Message(
+            arbitration_id=sensor["req_id"][0],
+            data=sensor["message_bytes"],
+            is_extended_id=is_extended
+        )
+        self.period = sensor.get("refresh_rate", 1)
+        self.priority = sensor.get("priority", 0)
+
+        self.next_due = now
+        self.sent_at = None
+        self.stats = LatencyStats()
+
+
+class TargetECU:
+    """Requests sharing one target ECU, with its own in-flight window and backoff."""
+
+    def __init__(self, target):
+        self.target = target
+        self.requests = []
+        self.in_flight = 0
+        self.backoff = 1.0
+        self.timeouts = 0
+
+    def next_request(self, now):
+        """Return the due request with the highest priority, most overdue first."""
+        best = None
+        for request in self.requests:
+            if request.sent_at is not None or request.next_due > now:
+                continue
+            if best is None or (request.priority, best.next_due) > (best.priority, request.next_due):
+                best = request
+        return best
+
+
+class DiagnosticScheduler(threading.Thread):
+    """Owns all diagnostic requests of one CAN interface.
+
+    Per target ECU at most `max_in_flight` requests are outstanding. The next
+    request goes out as soon as a reply arrives or `timeout` expires, so the
+    ECU is never flooded while the bus is used at the highest rate it can
+    answer. `refresh_rate` is the target period of a sensor; when an ECU
+    times out all its periods are stretched and recover again on replies.
+    """
+
+    def __init__(self, bus, sensors, is_extended, scheduler_settings, logger):
+        super().__init__()
+        self.daemon = True
+        self.logger = logger
+
+        self.bus = bus
+        self.max_in_flight = scheduler_settings.get("max_in_flight", 1)
+        self.timeout = scheduler_settings.get("timeout", 0.1)
+
+        self.targets = {}
+        self.pending = {}   # reply key -> request in flight
+
+        now = time.monotonic()
+        for sensor in sensors:
+            if sensor.get("type") != "diagnostic":
+                continue
+            target = sensor["message_bytes"][1]
+            if target not in self.targets:
+                self.targets[target] = TargetECU(target)
+            self.targets[target].requests.append(DiagnosticRequest(sensor, is_extended, now))
+
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        with self._condition:
+            while not self._stop_event.is_set():
+                now = time.monotonic()
+                self._expire(now)
+                self._send_due(now)
+                self._condition.wait(self._next_wakeup(now))
+
+    def on_reply(self, key):
+        """Called by the CANListener for every matched diagnostic reply."""
+        with self._condition:
+            request = self.pending.pop(key, None)
+            if request is None:
+                return
+
+            now = time.monotonic()
+            request.stats.add_reply(now - request.sent_at, now)
+
+            target = self.targets[request.sensor["message_bytes"][1]]
+            target.in_flight -= 1
+            target.backoff = max(1.0, target.backoff * RECOVERY_STEP)
+            request.sent_at = None
+
+            self._condition.notify()
+
+    def stats(self):
+        """Latency statistics per sensor id, see LatencyStats."""
+        with self._condition:
+            report = {}
+            for target in self.targets.values():
+                for request in target.requests:
+                    stats = request.stats.as_dict()
+                    stats["target"] = f"0x{target.target:02X}"
+                    stats["refresh_rate"] = request.period
+                    stats["backoff"] = round(target.backoff, 2)
+                    report[request.sensor["id"]] = stats
+            return report
+
+    def stop(self):
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify()
+
+    def _expire(self, now):
+        for key, request in list(self.pending.items()):
+            if now - request.sent_at < self.timeout:
+                continue
+
+            del self.pending[key]
+            target = self.targets[request.sensor["message_bytes"][1]]
+            target.in_flight -= 1
+            target.timeouts += 1
+            request.stats.timeouts += 1
+            request.sent_at = None
+
+            if target.backoff < MAX_BACKOFF:
+                target.backoff = min(MAX_BACKOFF, target.backoff * BACKOFF_STEP)
+                self.logger.debug(f"ECU 0x{target.target:02X} timed out on {request.sensor['id']}, slowing down to x{target.backoff:.2f}")
+
+    def _send_due(self, now):
+        for target in self.targets.values():
+            while target.in_flight < self.max_in_flight:
+                request = target.next_request(now)
+                if request is None:
+                    break
+
+                try:
+                    self.bus.send(request.msg)
+                except can.CanError as e:
+                    self.logger.error(f"Error sending diagnostic request for {request.sensor['id']}: {e}")
+                    request.next_due = now + request.period * target.backoff
+                    break
+
+                request.sent_at = time.monotonic()  # taken after send, latency excludes our own scheduling
+                request.next_due = now + request.period * target.backoff
+                target.in_flight += 1
+                self.pending[request.key] = request
+
+    def _next_wakeup(self, now):
+        wakeup = now + 1.0
+        for request in self.pending.values():
+            wakeup = min(wakeup, request.sent_at + self.timeout)
+
+        for target in self.targets.values():
+            if target.in_flight >= self.max_in_flight:
+                continue
+            for request in target.requests:
+                if request.sent_at is None:
+                    wakeup = min(wakeup, request.next_due)
+
+        return max(0.0, wakeup - now)
+
+
+def format_latency_report(report):
+    """Render scheduler stats (sensor id -> LatencyStats.as_dict) as a text table."""
+    def cell(value):
+        return "-" if value is None else f"{value:g}"
+
+    lines = [f"{'sensor':<16} {'ecu':>4} {'refresh':>7} {'achieved':>8} {'replies':>7} {'timeouts':>8} "
+             f"{'mean ms':>7} {'p50 ms':>6} {'p90 ms':>6} {'p99 ms':>6} {'max ms':>7} {'backoff':>7}"]
+    for sensor_id, stats in sorted(report.items()):
+        lines.append(
+            f"{sensor_id:<16} {stats['target']:>4} {cell(stats['refresh_rate']):>7} {cell(stats['achieved_period']):>8} "
+            f"{stats['replies']:>7} {stats['timeouts']:>8} {cell(stats['mean_ms']):>7} {cell(stats['p50_ms']):>6} "
+            f"{cell(stats['p90_ms']):>6} {cell(stats['p99_ms']):>6} {cell(stats['max_ms']):>7} {cell(stats['backoff']):>7}"
+        )
+    return "\n".join(lines)
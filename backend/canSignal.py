@@ -0,0 +1,76 @@
+"""
+    Broadcast CAN signals, decoded DBC style.
+
+    A signal is defined by its start bit, length, byte order, signedness,
+    factor and offset like in a DBC file. Bits are numbered per byte from
+    LSB (bit 0 of byte 0) to MSB (bit 63 of byte 7):
+
+        little_endian (Intel, @1):    start bit is the LSB of the signal
+        big_endian (Motorola, @0):    start bit is the MSB of the signal
+
+    compile_extractor turns the definition into a function data -> value that
+    only touches the bytes the signal occupies.
+"""
+
+BYTE_ORDERS = ("little_endian", "big_endian")
+
+
+def compile_extractor(start_bit, length, byte_order="little_endian", signed=False, factor=1.0, offset=0.0):
+    """Return (extract, min_length) for a signal, extract(data) returns the physical value.
+
+    min_length is the number of data bytes a frame needs to carry the signal.
+    Raises ValueError for definitions that do not fit an 8 byte frame.
+    """
+    if byte_order not in BYTE_ORDERS:
+        raise ValueError(f"byte_order must be one of {', '.join(BYTE_ORDERS)}, not '{byte_order}'")
+    if not 1 <= length <= 64:
+        raise ValueError(f"length must be between 1 and 64 bits, not {length}")
+    if not 0 <= start_bit < 64:
+        raise ValueError(f"start_bit must be between 0 and 63, not {start_bit}")
+
+    mask = (1 << length) - 1
+    sign_bit = 1 << (length - 1)
+    modulus = 1 << length
+
+    if byte_order == "little_endian":
+        first = start_bit // 8
+        last = (start_bit + length - 1) // 8
+        shift = start_bit - first * 8
+        order = "little"
+    else:
+        # position counted from the MSB of byte 0, in which a big endian signal is contiguous
+        msb = (start_bit // 8) * 8 + (7 - start_bit % 8)
+        lsb = msb + length - 1
+        first = msb // 8
+        last = lsb // 8
+        shift = (last + 1) * 8 - 1 - lsb
+        order = "big"
+
+    if last > 7:
+        raise ValueError(f"signal at bit {start_bit} with {length} bits does not fit into 8 bytes")
+
+    end = last + 1
+    from_bytes = int.from_bytes
+
+    if signed:
+        def extract(data):
+            raw = (from_bytes(data[first:end], order) >> shift) & mask
+            if raw & sign_bit:
+                raw -= modulus
+            return raw * factor + offset
+    else:
+        def extract(data):
+            return ((from_bytes(data[first:end], order) >> shift) & mask) * factor + offset
+
+    return extract, end
+
+
+def build_broadcast_table(sensors, logger):
+    """Index broadcast sensors by arbitration id, each entry a list of (sensor, extract, min_length)."""
+    broadcast = {}
+    for sensor in sensors:
+        if sensor.get("type") != "broadcast":
+            continue
+        broadcast.setdefault(sensor["rep_id"][0], []).append((sensor, sensor["extract"], sensor["min_length"]))
+        logger.debug(f"Decoding {sensor['id']} from broadcast frame 0x{sensor['rep_id'][0]:X}")
+    return broadcast
@@ -0,0 +1,420 @@
+"""
+    Session data logger for decoded sensor values.
+
+    Every value the CAN and ADC threads hand to their DataBatcher is appended
+    here at full rate, before deadbands and the emit rate limit. Samples are
+    collected in memory per column and written as one compressed chunk every
+    `flush_interval` seconds (or `chunk_samples` samples), so the SD card sees
+    a few large writes per minute instead of one per sample. Files are only
+    fsynced every `sync_interval` seconds and when they are closed.
+
+    Layout:
+        <directory>/<YYYYmmdd-HHMMSS>/           one directory per session
+            data-<YYYYmmdd-HHMMSS>.vdat         time partition, a new file every `partition_seconds`
+            index.txt                           one line per chunk: file offset length start end samples
+
+    Chunk (little-endian):
+        header (32 bytes):
+            magic "VDC1", payload length (u32), sample count (u32), column count (u16), padding (u16),
+            start and end time (f64, seconds since epoch)
+        payload, zlib compressed, per column:
+            name length (u16), sample count (u32), name ("<module>/<app_id>", utf-8),
+            times (u32, milliseconds since the chunk start, delta encoded), values (f32)
+
+    A chunk cut off by a power loss fails to decompress, readers stop at the
+    first bad chunk of a file. The index only speeds up time range queries,
+    without it the chunk headers are scanned. When the logs grow beyond
+    `max_size` the oldest partitions are removed.
+
+    Print the columns of a session:
+        python -m backend.datalog ~/v-link/logs/data/20250101-120000
+"""
+
+import argparse
+import array
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+
+import numpy as np
+
+MAGIC = b"VDC1"
+CHUNK = struct.Struct("<4sIIH2xdd")
+COLUMN = struct.Struct("<HI")
+
+INDEX_FILE = "index.txt"
+DATA_SUFFIX = ".vdat"
+
+MAX_CHUNK_SPAN = 86400.0    # seconds, keeps the u32 millisecond offsets far from wrapping
+
+
+class DataLog:
+    """Append-only columnar sample log fed from any thread.
+
+    append() only adds to two arrays under a lock. Full chunks are handed to
+    a writer thread that compresses and writes them; if it falls behind and
+    `max_pending` chunks are waiting, new chunks are counted as dropped.
+    """
+
+    def __init__(self, directory, chunk_samples=65536, flush_interval=30.0, partition_seconds=600,
+                 sync_interval=60.0, max_size=512 * 1024 * 1024, compression=6, max_pending=8, logger=None):
+        self.directory = os.path.expanduser(directory)
+        self.chunk_samples = chunk_samples
+        self.flush_interval = flush_interval
+        self.partition_seconds = partition_seconds
+        self.sync_interval = sync_interval
+        self.max_size = max_size
+        self.compression = compression
+        self.logger = logger
+
+        self.session = os.path.join(self.directory, time.strftime("%Y%m%d-%H%M%S"))
+        self.samples = 0
+        self.chunks = 0
+        self.bytes_written = 0
+        self.dropped = 0
+
+        self._columns = {}      # (module, app_id) -> (times, values)
+        self._count = 0
+        self._start = 0.0       # first and latest timestamp of the open chunk
+        self._last = 0.0
+        self._lock = threading.Lock()
+        self._pending = queue.Queue(max_pending)
+
+        self._file = None
+        self._file_end = 0.0    # partition end time
+        self._index = None
+        self._last_sync = 0.0
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+
+    def start(self):
+        os.makedirs(self.session, exist_ok=True)
+        self._index = open(os.path.join(self.session, INDEX_FILE), "a")
+        self._writer.start()
+
+    def close(self):
+        with self._lock:
+            self._seal()
+        self._pending.put(None)
+        self._writer.join(timeout=10)
+
+        self._close_file()
+        if self._index:
+            self._index.close()
+            self._index = None
+
+        if self.logger:
+            self.logger.info(f"Data log: {self.samples} samples in {self.chunks} chunks "
+                             f"({self.bytes_written / 1024:.0f} kB), {self.dropped} dropped")
+
+    def append(self, module, app_id, value, timestamp=None):
+        with self._lock:
+            if timestamp is None:
+                timestamp = time.time()  # taken under the lock, so appends arrive in time order
+
+            # Times are stored as unsigned offsets from the chunk start, a wall
+            # clock step back or a jump beyond MAX_CHUNK_SPAN starts a new chunk
+            if self._count and (timestamp < self._last or timestamp - self._start > MAX_CHUNK_SPAN):
+                self._seal()
+
+            column = self._columns.get((module, app_id))
+            if column is None:
+                column = self._columns[(module, app_id)] = (array.array("d"), array.array("f"))
+            try:
+                column[1].append(value)
+            except TypeError:
+                if not column[1]:
+                    del self._columns[(module, app_id)]
+                return  # not a number, only numeric values are logged
+            column[0].append(timestamp)
+            if not self._count:
+                self._start = timestamp
+            self._last = timestamp
+            self._count += 1
+
+            if self._count >= self.chunk_samples:
+                self._seal()
+
+    def _seal(self):
+        # called with self._lock held
+        if not self._count:
+            return
+
+        columns, count = self._columns, self._count
+        self._columns, self._count = {}, 0
+        try:
+            self._pending.put_nowait((columns, count))
+        except queue.Full:
+            self.dropped += count
+
+    def _write_loop(self):
+        while True:
+            try:
+                item = self._pending.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self._lock:
+                    self._seal()
+                continue
+
+            if item is None:
+                break
+            self._write(item)
+
+        # write what is left after the stop sentinel
+        while not self._pending.empty():
+            item = self._pending.get_nowait()
+            if item:
+                self._write(item)
+
+    def _write(self, item):
+        try:
+            self._write_chunk(*item)
+        except (OSError, ValueError) as e:
+            self.dropped += item[1]
+            if self.logger:
+                self.logger.error(f"Data log write failed: {e}")
+
+    def _write_chunk(self, columns, count):
+        start = min(times[0] for times, _ in columns.values())
+        end = max(times[-1] for times, _ in columns.values())
+
+        parts = []
+        for (module, app_id), (times, values) in columns.items():
+            name = f"{module}/{app_id}".encode()
+            offsets = np.round((np.frombuffer(times, dtype=np.float64) - start) * 1000).astype(np.int64)
+            deltas = np.diff(offsets, prepend=0)  # non-negative, see append()
+            parts.append(COLUMN.pack(len(name), len(times)))
+            parts.append(name)
+            parts.append(deltas.astype("<u4").tobytes())
+            parts.append(np.frombuffer(values, dtype=np.float32).astype("<f4").tobytes())
+        payload = zlib.compress(b"".join(parts), self.compression)
+
+        if self._file is None or start >= self._file_end:
+            self._open_file(start)
+
+        offset = self._file.tell()
+        self._file.write(CHUNK.pack(MAGIC, len(payload), count, len(columns), start, end) + payload)
+        self._index.write(f"{os.path.basename(self._file.name)} {offset} {CHUNK.size + len(payload)} "
+                          f"{start:.3f} {end:.3f} {count}\n")
+        self._index.flush()
+
+        self.samples += count
+        self.chunks += 1
+        self.bytes_written += CHUNK.size + len(payload)
+
+        if time.monotonic() - self._last_sync >= self.sync_interval:
+            self._sync()
+
+    def _sync(self):
+        self._last_sync = time.monotonic()
+        for file in (self._file, self._index):
+            if file:
+                file.flush()
+                os.fsync(file.fileno())
+
+    def _open_file(self, start):
+        self._close_file()
+
+        # partitions start at multiples of partition_seconds, so sessions line up
+        partition = start - start % self.partition_seconds
+        self._file_end = partition + self.partition_seconds
+
+        name = f"data-{time.strftime('%Y%m%d-%H%M%S', time.localtime(partition))}{DATA_SUFFIX}"
+        self._file = open(os.path.join(self.session, name), "ab")
+        self._apply_retention()
+
+    def _close_file(self):
+        if self._file:
+            self._sync()
+            self._file.close()
+            self._file = None
+
+    def _apply_retention(self):
+        partitions = []
+        for session in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, session)
+            if not os.path.isdir(path):
+                continue
+            for name in sorted(os.listdir(path)):
+                if name.endswith(DATA_SUFFIX):
+                    partitions.append(os.path.join(path, name))
+
+        total = sum(os.path.getsize(path) for path in partitions)
+        for path in partitions:
+            if total <= self.max_size:
+                break
+            if self._file and path == self._file.name:
+                continue
+            try:
+                total -= os.path.getsize(path)
+                os.remove(path)
+            except OSError as e:
+                if self.logger:
+                    self.logger.error(f"Data log could not remove old partition '{path}': {e}")
+                continue
+
+            # remove sessions without partitions left
+            session = os.path.dirname(path)
+            if session != self.session and not any(name.endswith(DATA_SUFFIX) for name in os.listdir(session)):
+                try:
+                    os.remove(os.path.join(session, INDEX_FILE))
+                    os.rmdir(session)
+                except OSError:
+                    pass
+
+
+def decode_chunk(header, payload):
+    """Return {name: (times, values)} numpy arrays for one chunk."""
+    _, _, _, column_count, start, _ = header
+    data = zlib.decompress(payload)
+
+    columns = {}
+    position = 0
+    for _ in range(column_count):
+        name_length, count = COLUMN.unpack_from(data, position)
+        position += COLUMN.size
+        name = data[position:position + name_length].decode()
+        position += name_length
+        deltas = np.frombuffer(data, dtype="<u4", count=count, offset=position)
+        position += count * 4
+        values = np.frombuffer(data, dtype="<f4", count=count, offset=position)
+        position += count * 4
+        columns[name] = (start + np.cumsum(deltas, dtype=np.uint64) / 1000.0, values.astype(np.float64))
+    return columns
+
+
+def read_chunk(file, offset=None):
+    """Read the chunk at `offset` (or the current position), None at the end or at a damaged chunk."""
+    if offset is not None:
+        file.seek(offset)
+    header = file.read(CHUNK.size)
+    if len(header) < CHUNK.size:
+        return None
+    header = CHUNK.unpack(header)
+    if header[0] != MAGIC:
+        return None
+    payload = file.read(header[1])
+    try:
+        return header, decode_chunk(header, payload)
+    except (zlib.error, ValueError):
+        return None
+
+
+def read_index(session):
+    """Return [(file, offset, length, start, end, samples)] from the index of a session, [] if it has none."""
+    entries = []
+    try:
+        with open(os.path.join(session, INDEX_FILE)) as file:
+            for line in file:
+                try:
+                    name, offset, length, start, end, samples = line.split()
+                    entries.append((name, int(offset), int(length), float(start), float(end), int(samples)))
+                except ValueError:
+                    continue  # line cut off by a power loss
+    except OSError:
+        pass
+    return entries
+
+
+def iter_chunks(path, start=None, end=None):
+    """Yield {name: (times, values)} for every chunk of a session directory or partition file.
+
+    With `start`/`end` only chunks overlapping that time range are read,
+    using the session index when there is one.
+    """
+    start = float("-inf") if start is None else start
+    end = float("inf") if end is None else end
+
+    if os.path.isdir(path):
+        session, names = path, sorted(name for name in os.listdir(path) if name.endswith(DATA_SUFFIX))
+    else:
+        session, names = os.path.dirname(path), [os.path.basename(path)]
+
+    entries = [entry for entry in read_index(session) if entry[0] in names]
+    indexed = {entry[0] for entry in entries}
+
+    for name in names:
+        file_path = os.path.join(session, name)
+        if not os.path.exists(file_path):
+            continue
+
+        with open(file_path, "rb") as file:
+            if name in indexed:
+                for _, offset, _, chunk_start, chunk_end, _ in (entry for entry in entries if entry[0] == name):
+                    if chunk_end < start or chunk_start > end:
+                        continue
+                    chunk = read_chunk(file, offset)
+                    if chunk is None:
+                        break
+                    yield chunk[1]
+            else:
+                while True:
+                    chunk = read_chunk(file)
+                    if chunk is None:
+                        break
+                    header, columns = chunk
+                    if header[5] >= start and header[4] <= end:
+                        yield columns
+
+
+def time_range(path):
+    """Return (first, last) sample time of a session directory or partition file, None if it is empty."""
+    session = path if os.path.isdir(path) else os.path.dirname(path)
+    entries = [entry for entry in read_index(session)
+               if (os.path.isdir(path) or entry[0] == os.path.basename(path))
+               and os.path.exists(os.path.join(session, entry[0]))]
+    if entries:
+        return min(entry[3] for entry in entries), max(entry[4] for entry in entries)
+
+    ranges = [(times[0], times[-1]) for columns in iter_chunks(path) for times, _ in columns.values() if len(times)]
+    if not ranges:
+        return None
+    return min(first for first, _ in ranges), max(last for _, last in ranges)
+
+
+def read_session(path, start=None, end=None, names=None):
+    """Return {name: (times, values)} for a session directory or partition file, sorted by time.
+
+    `names` limits the result to these columns ("<module>/<app_id>").
+    """
+    parts = {}
+    for columns in iter_chunks(path, start, end):
+        for name, (times, values) in columns.items():
+            if names is None or name in names:
+                parts.setdefault(name, []).append((times, values))
+
+    result = {}
+    for name, chunks in parts.items():
+        times = np.concatenate([times for times, _ in chunks])
+        values = np.concatenate([values for _, values in chunks])
+        order = np.argsort(times, kind="stable")
+        times, values = times[order], values[order]
+
+        keep = np.ones(len(times), dtype=bool)
+        if start is not None:
+            keep &= times >= start
+        if end is not None:
+            keep &= times <= end
+        result[name] = (times[keep], values[keep])
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Print the columns of a V-Link data log session")
+    parser.add_argument("path", help="Session directory or partition file (.vdat)")
+    args = parser.parse_args()
+
+    columns = read_session(args.path)
+    for name, (times, values) in sorted(columns.items()):
+        if not len(times):
+            continue
+        print(f"{name:<32} {len(times):>9} samples  "
+              f"{time.strftime('%H:%M:%S', time.localtime(times[0]))} - {time.strftime('%H:%M:%S', time.localtime(times[-1]))}  "
+              f"min {values.min():.6g}  max {values.max():.6g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+    Load test for the ADC pipeline on simulated chips.
+
+    Runs ADCThread's acquisition engine against SimulatedADC devices, so the
+    scheduling, filtering, interpolation and emit path are exercised exactly
+    like on the car, at data rates the real chips don't reach. Every scenario
+    (chips x sensors per chip x data rate) reports:
+
+        samples/s       conversion results delivered, all channels together
+        output          time spent converting all sensors once per emit cycle, us
+        emits/s         batches the DataBatcher emitted to the frontend
+
+    Usage:
+        python -m backend.dev.bench_adc --chips 1,3 --data-rates 860,20000 --json results.json
+"""
+
+import argparse
+import json
+import logging
+import platform
+import threading
+import time
+
+from ..adc import ADCThread
+from ..shared.batcher import DataBatcher
+from ..shared.shared_state import shared_state
+from .bench_can import CountingPublisher, percentiles
+
+FILTERS = ({"type": "median", "size": 7, "outlier": 0.5}, {"type": "ema", "alpha": 0.3},
+           {"type": "average", "size": 16}, {"type": "none"})
+NTC = {"44864": -40, "15067": -20, "5784": 0, "2480": 20, "1167": 40, "594": 60, "323.4": 80, "186.6": 100, "113.3": 120, "71.9": 140}
+
+
+def make_settings(chips, sensors_per_chip, data_rate, emit_rate):
+    settings = {
+        "emit_rate": emit_rate,
+        "devices": {f"adc{chip}": {"data_rate": data_rate} for chip in range(chips)},
+        "sensors": {},
+    }
+    for chip in range(chips):
+        for pin in range(sensors_per_chip):
+            app_id = f"adc{chip}_p{pin}"
+            ntc = pin % 2 == 1
+            settings["sensors"][app_id] = {
+                "app_id": app_id,
+                "scale": "(value * 1)",
+                "ntc": ntc,
+                "device": f"adc{chip}",
+                "channel": f"P{pin}",
+                "sample_rate": data_rate,  # as fast as the chip allows
+                "filter": FILTERS[pin % len(FILTERS)],
+                "simulation": {"waveform": "sine", "min": 0.5, "max": 2.8 if ntc else 4.5, "period": 2, "spikes": 0.001},
+                "characteristic": NTC if ntc else {"0.5": 0, "4.5": 1000},
+            }
+    return settings
+
+
+def run_scenario(chips, sensors_per_chip, data_rate, duration, emit_rate, logger):
+    adc_thread = ADCThread(logger, make_settings(chips, sensors_per_chip, data_rate, emit_rate))
+    adc_thread.read_settings()
+    adc_thread.init_adc()
+
+    publisher = CountingPublisher()
+    adc_thread.batcher = DataBatcher("/adc", emit_rate, publisher.publish)
+
+    # time every emit cycle
+    output_times = []
+    process_output = adc_thread.process_output
+
+    def timed_output():
+        start = time.perf_counter_ns()
+        process_output()
+        output_times.append((time.perf_counter_ns() - start) / 1000)
+    adc_thread.process_output = timed_output
+
+    runner = threading.Thread(target=adc_thread.start_adc, daemon=True)
+    adc_thread.batcher.start()
+    start = time.perf_counter()
+    runner.start()
+    time.sleep(duration)
+    adc_thread._stop_event.set()
+    runner.join()
+    elapsed = time.perf_counter() - start
+    adc_thread.batcher.stop()
+
+    stats = adc_thread.stats()
+    samples = sum(rates["samples"] for rates in stats.values())
+    return {
+        "chips": chips,
+        "sensors_per_chip": sensors_per_chip,
+        "data_rate": data_rate,
+        "samples_per_second": round(samples / elapsed, 1),
+        "rejected": sum(rates["rejected"] for rates in stats.values()),
+        "output_us": {key: round(value, 1) if value is not None else None for key, value in percentiles(output_times).items()},
+        "emits_per_second": round(publisher.emits / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the ADC pipeline on simulated chips")
+    parser.add_argument("--chips", default="1,3", help="Comma separated chip counts")
+    parser.add_argument("--sensors", default="4", help="Comma separated sensors per chip (1-4)")
+    parser.add_argument("--data-rates", default="860,3300,20000", help="Comma separated simulated data rates")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per scenario")
+    parser.add_argument("--emit-rate", type=int, default=30, help="Emit rate of the ADC thread")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    logger = logging.getLogger("vlink.bench")
+    logger.setLevel(logging.CRITICAL)
+    shared_state.vAdc = True
+
+    results = []
+    print(f"{'chips':>5} {'sensors':>7} {'rate':>6} {'samples/s':>10} {'output p50 us':>13} {'p99 us':>8} {'emits/s':>7}")
+    for chips in (int(count) for count in args.chips.split(",")):
+        for sensors_per_chip in (int(count) for count in args.sensors.split(",")):
+            for data_rate in (int(rate) for rate in args.data_rates.split(",")):
+                result = run_scenario(chips, sensors_per_chip, data_rate, args.duration, args.emit_rate, logger)
+                results.append(result)
+                print(f"{chips:>5} {sensors_per_chip:>7} {data_rate:>6} {result['samples_per_second']:>10.0f} "
+                      f"{result['output_us']['p50'] or 0:>13.1f} {result['output_us']['p99'] or 0:>8.1f} "
+                      f"{result['emits_per_second']:>7}")
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "machine": platform.machine(),
+                "duration": args.duration,
+                "emit_rate": args.emit_rate,
+                "results": results,
+            }, file, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
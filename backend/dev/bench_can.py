@@ -0,0 +1,260 @@
+"""
+    Throughput benchmark for the CAN ingest path.
+
+    A sender thread writes diagnostic replies onto a bus at a fixed frame rate
+    while a can.Notifier feeds them into CANListener, exactly like CANThread
+    does. Every scenario (interface x sensor count x frame rate) reports:
+
+        frames/s        frames decoded per second
+        latency         send -> decoded, percentiles in microseconds
+        decode          time spent in CANListener.on_message_received, ns
+        dropped         frames sent but never decoded (backlog or kernel drops)
+        emits/s         batches the DataBatcher emitted to the frontend
+
+    Runs headless on python-can's virtual interface. vcan0 is used as well
+    when it exists (see backend/dev/setup.sh), otherwise it is skipped.
+
+    Usage:
+        python -m backend.dev.bench_can --rates 1000,5000,0 --sensors 5,50 --json results.json
+        python -m backend.dev.bench_can --compare baseline.json
+
+    A rate of 0 sends as fast as possible. --compare exits with status 1 if
+    any scenario decodes more than --tolerance fewer frames/s than the baseline.
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import sys
+import threading
+import time
+
+import can
+
+from ..can import Config, CANListener, build_dispatch_table
+from ..shared.batcher import DataBatcher
+from .bench_dispatch import CONTROL_SETTINGS, REP_ID, make_settings
+
+DRAIN_TIMEOUT = 2.0     # seconds to wait for the listener to catch up after sending
+
+
+class CountingPublisher:
+    """Stands in for the event bus, counts published batches."""
+
+    def __init__(self):
+        self.emits = 0
+        self.values = 0
+
+    def publish(self, namespace, event, data):
+        self.emits += 1
+        self.values += len(data)
+
+
+class TimingListener(can.Listener):
+    """Wraps CANListener and records send->decode latency and decode cost per frame."""
+
+    def __init__(self, listener, expected):
+        self.listener = listener
+        self.expected = expected
+        self.latency = []
+        self.decode = []
+        self.last = None
+        self.done = threading.Event()
+
+    def on_message_received(self, msg):
+        start = time.perf_counter_ns()
+        self.listener.on_message_received(msg)
+        self.decode.append(time.perf_counter_ns() - start)
+        self.latency.append(time.time() - msg.timestamp)
+        self.last = time.perf_counter()
+
+        if len(self.decode) >= self.expected:
+            self.done.set()
+
+
+def open_buses(interface):
+    """Return a (sender, receiver) pair on the same channel, or None if the interface is unavailable."""
+    if interface == "virtual":
+        channel, bustype = f"bench-{random.getrandbits(32):08x}", "virtual"
+    else:
+        # a SocketcanBus that fails in its constructor warns when it is collected, check first
+        if not os.path.exists(f"/sys/class/net/{interface}"):
+            return None
+        channel, bustype = interface, "socketcan"
+
+    buses = []
+    try:
+        for _ in range(2):
+            buses.append(can.interface.Bus(channel=channel, bustype=bustype))
+        return tuple(buses)
+    except Exception:
+        for bus in buses:
+            bus.shutdown()
+        return None
+
+
+def make_frames(sensors, count):
+    frames = []
+    for i in range(count):
+        message_bytes = sensors[i % len(sensors)]["message_bytes"]
+        data = [0xCD, 0x11, 0xE6, message_bytes[3], message_bytes[4], (i >> 8) & 0xFF, i & 0xFF, 0x00]
+        frames.append(can.Message(arbitration_id=REP_ID, data=data, is_extended_id=True))
+    return frames
+
+
+def send_frames(bus, frames, rate, start):
+    """Send frames at `rate` frames/s (0 = unthrottled), return the number actually sent."""
+    sent = 0
+    for msg in frames:
+        if rate:
+            delay = start + sent / rate - time.perf_counter()
+            if delay > 0.0005:
+                time.sleep(delay)
+        try:
+            bus.send(msg)
+        except can.CanError:
+            continue  # socketcan tx queue full, counted as dropped
+        sent += 1
+    return sent
+
+
+def percentiles(samples, points=(50, 90, 99, 99.9)):
+    if not samples:
+        return dict.fromkeys([f"p{point:g}" for point in points] + ["max"])
+    ordered = sorted(samples)
+    result = {f"p{point:g}": ordered[min(len(ordered) - 1, int(len(ordered) * point / 100))] for point in points}
+    result["max"] = ordered[-1]
+    return result
+
+
+def run_scenario(interface, sensor_count, rate, duration, emit_rate, logger):
+    sender, receiver = open_buses(interface)
+
+    config = Config(logger, can_settings=make_settings(sensor_count))
+    sensors = config.sensors["vcan0"]
+
+    publisher = CountingPublisher()
+    batcher = DataBatcher("/can", emit_rate, publisher.publish)
+    listener = CANListener(build_dispatch_table(sensors, logger), CONTROL_SETTINGS, batcher, logger)
+
+    # unthrottled runs are capped by frame count instead of time
+    frame_count = int(rate * duration) if rate else 200000
+    frames = make_frames(sensors, frame_count)
+    timing = TimingListener(listener, frame_count)
+
+    notifier = can.Notifier(receiver, [timing])
+    batcher.start()
+    try:
+        start = time.perf_counter()
+        sent = send_frames(sender, frames, rate, start)
+        send_time = time.perf_counter() - start
+        timing.done.wait(DRAIN_TIMEOUT + (0 if rate else duration))
+        decode_time = (timing.last or start) - start
+    finally:
+        notifier.stop()
+        batcher.stop()
+        sender.shutdown()
+        receiver.shutdown()
+
+    decoded = len(timing.decode)
+    latency = percentiles([seconds * 1e6 for seconds in timing.latency])
+    decode = percentiles(timing.decode)
+
+    return {
+        "interface": interface,
+        "sensors": sensor_count,
+        "target_rate": rate,
+        "frames_sent": sent,
+        "frames_decoded": decoded,
+        "dropped": frame_count - decoded,
+        "send_rate": round(sent / send_time, 1) if send_time else None,
+        "frames_per_second": round(decoded / decode_time, 1) if decode_time else 0.0,
+        "latency_us": {key: round(value, 1) if value is not None else None for key, value in latency.items()},
+        "decode_ns": decode,
+        "emits_per_second": round(publisher.emits / decode_time, 1) if decode_time else 0.0,
+        "values_per_emit": round(publisher.values / publisher.emits, 1) if publisher.emits else 0,
+    }
+
+
+def scenario_key(result):
+    return (result["interface"], result["sensors"], result["target_rate"])
+
+
+def compare(results, baseline_path, tolerance):
+    """Print frames/s changes against a baseline file, return True if nothing regressed."""
+    with open(baseline_path) as file:
+        baseline = {scenario_key(result): result for result in json.load(file)["results"]}
+
+    ok = True
+    for result in results:
+        previous = baseline.get(scenario_key(result))
+        if not previous or not previous["frames_per_second"]:
+            continue
+        change = result["frames_per_second"] / previous["frames_per_second"] - 1
+        regressed = change < -tolerance
+        ok = ok and not regressed
+        print(f"{result['interface']:>8} {result['sensors']:>7} {result['target_rate'] or 'max':>7} "
+              f"{previous['frames_per_second']:>10.0f} -> {result['frames_per_second']:>10.0f} "
+              f"{change:+7.1%}{'  REGRESSION' if regressed else ''}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CAN ingest path")
+    parser.add_argument("--interfaces", default="virtual,vcan0", help="Comma separated: virtual and/or socketcan channels")
+    parser.add_argument("--rates", default="1000,5000,20000,0", help="Comma separated frame rates in frames/s, 0 = unthrottled")
+    parser.add_argument("--sensors", default="5,50,500", help="Comma separated sensor counts")
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per throttled scenario")
+    parser.add_argument("--emit-rate", type=int, default=30, help="DataBatcher emit rate")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--compare", help="Baseline results file to compare frames/s against")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed frames/s drop before --compare fails")
+    args = parser.parse_args()
+
+    logger = logging.getLogger("vlink.bench")
+    logger.setLevel(logging.CRITICAL)
+
+    results = []
+    print(f"{'iface':>8} {'sensors':>7} {'rate':>7} {'frames/s':>10} {'p50 us':>8} {'p99 us':>8} "
+          f"{'decode ns':>9} {'dropped':>7} {'emits/s':>7}")
+    for interface in args.interfaces.split(","):
+        buses = open_buses(interface)
+        if buses is None:
+            print(f"{interface:>8} not available, skipped")
+            continue
+        for bus in buses:
+            bus.shutdown()
+
+        for sensor_count in (int(count) for count in args.sensors.split(",")):
+            for rate in (int(rate) for rate in args.rates.split(",")):
+                result = run_scenario(interface, sensor_count, rate, args.duration, args.emit_rate, logger)
+                results.append(result)
+                print(f"{interface:>8} {sensor_count:>7} {rate or 'max':>7} {result['frames_per_second']:>10.0f} "
+                      f"{result['latency_us']['p50'] or 0:>8.0f} {result['latency_us']['p99'] or 0:>8.0f} "
+                      f"{result['decode_ns']['p50'] or 0:>9} {result['dropped']:>7} {result['emits_per_second']:>7}")
+
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "python_can": can.__version__,
+        "machine": platform.machine(),
+        "platform": platform.platform(),
+        "duration": args.duration,
+        "emit_rate": args.emit_rate,
+        "results": results,
+    }
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.compare and not compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
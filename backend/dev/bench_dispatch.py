@@ -0,0 +1,125 @@
+"""
+    Micro-benchmark for the CANListener reply dispatch.
+
+    Builds profiles with 5, 50 and 500 diagnostic sensors that all share one
+    reply id (like the ECM sensors in the P2 profile) and measures the cost of
+    CANListener.on_message_received per frame. The previous linear scan over
+    all sensors sharing a reply id is measured alongside for comparison. Both
+    paths hand their converted value to the same plain dict sink, so batching,
+    deadband and data log costs are left out of either number.
+
+    Usage: python -m backend.dev.bench_dispatch [--frames 200000]
+"""
+
+import argparse
+import logging
+import random
+import time
+
+import can
+
+from ..can import Config, CANListener, build_dispatch_table
+
+REQ_ID = 0x000FFFFE
+REP_ID = 0x01200021
+
+CONTROL_SETTINGS = {
+    "enabled": False,
+    "rep_id": "0x0131726C",
+    "zero_message": ["0x00", "0x00", "0x3F"],
+    "control_byte_count": 2,
+    "button": {},
+    "joystick": {},
+}
+
+
+def make_settings(sensor_count):
+    sensors = {}
+    for i in range(sensor_count):
+        sensors[f"sensor{i}"] = {
+            "interface": "vcan0",
+            "enabled": True,
+            "type": "diagnostic",
+            "parameter": [f"0x{(i >> 8) & 0xFF:02X}", f"0x{i & 0xFF:02X}"],
+            "app_id": f"s{i}",
+            "req_id": f"0x{REQ_ID:08X}",
+            "rep_id": f"0x{REP_ID:08X}",
+            "action": "0xA6",
+            "target": "0x11",
+            "is_16bit": True,
+            "refresh_rate": 1,
+            "scale": "((value * 0.001)-0.98)",
+        }
+    return {"interfaces": [], "sensors": sensors, "controls": CONTROL_SETTINGS}
+
+
+def make_replies(sensors, count):
+    replies = []
+    for _ in range(count):
+        message_bytes = random.choice(sensors)["message_bytes"]
+        data = [0xCD, 0x11, 0xE6, message_bytes[3], message_bytes[4], 0x12, 0x34, 0x00]
+        replies.append(can.Message(arbitration_id=REP_ID, data=data, is_extended_id=True))
+    return replies
+
+
+class Collector:
+    """Stands in for the batcher: keeps the last value per app_id and nothing else."""
+
+    def __init__(self):
+        self.values = {}
+
+    def put(self, app_id, value):
+        self.values[app_id] = value
+
+
+def legacy_dispatch(sensors_by_id, sink, msg):
+    """Reference: per-frame list copy and linear scan used before the dispatch table."""
+    if msg.arbitration_id in sensors_by_id:
+        data = list(msg.data)
+        for sensor in sensors_by_id[msg.arbitration_id]:
+            if (data[2] != sensor['message_bytes'][2] and
+                data[3] == sensor["message_bytes"][3] and
+                data[4] == sensor["message_bytes"][4]):
+                value = ((data[5] << 8) | data[6] if sensor["is_16bit"] else data[5])
+                sink.put(sensor["id"], float(sensor["convert"](value)))
+                return
+
+
+def measure(function, replies):
+    start = time.perf_counter_ns()
+    for msg in replies:
+        function(msg)
+    return (time.perf_counter_ns() - start) / len(replies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark CAN reply dispatch")
+    parser.add_argument("--frames", type=int, default=200000, help="Frames per measurement")
+    args = parser.parse_args()
+
+    logger = logging.getLogger("vlink.bench")
+    logger.setLevel(logging.CRITICAL)
+
+    print(f"{'sensors':>8} {'dispatch ns/frame':>18} {'legacy ns/frame':>16} {'speedup':>8}")
+    for sensor_count in (5, 50, 500):
+        config = Config(logger, can_settings=make_settings(sensor_count))
+        sensors = config.sensors["vcan0"]
+
+        listener = CANListener(build_dispatch_table(sensors, logger), CONTROL_SETTINGS, Collector(), logger)
+        legacy_sink = Collector()
+        sensors_by_id = {REP_ID: sensors}
+
+        replies = make_replies(sensors, args.frames)
+
+        # warm up both paths before measuring
+        measure(listener.on_message_received, replies[:1000])
+        measure(lambda msg: legacy_dispatch(sensors_by_id, legacy_sink, msg), replies[:1000])
+
+        dispatch_ns = measure(listener.on_message_received, replies)
+        legacy_ns = measure(lambda msg: legacy_dispatch(sensors_by_id, legacy_sink, msg), replies)
+
+        print(f"{sensor_count:>8} {dispatch_ns:>18.0f} {legacy_ns:>16.0f} {legacy_ns / dispatch_ns:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+import glob
+import os
+import threading
+import time
+
+import can
+
+from ..recorder import read_log, KIND_CAN, KIND_LIN, KIND_ADC, FLAG_EXTENDED, FLAG_REMOTE, FLAG_FD, ADC_SAMPLE
+from ..shared.shared_state import shared_state
+
+
+class ReplayClock:
+    """Maps recorded timestamps to wall time at a fixed speed.
+
+    All replay streams (CAN, LIN, ADC) share one clock, so they stay aligned
+    to the original timing. A speed of 0 replays as fast as possible.
+    """
+
+    def __init__(self, origin, speed=1.0):
+        self.origin = origin
+        self.speed = speed
+        self._start = None
+        self._lock = threading.Lock()
+
+    def reset(self):
+        """Start over, the next wait_until call marks the beginning of the recording."""
+        with self._lock:
+            self._start = None
+
+    def wait_until(self, timestamp, stop_event):
+        """Block until `timestamp` is due. Returns False if replay was stopped."""
+        if self.speed <= 0:
+            return not stop_event.is_set()
+
+        with self._lock:
+            if self._start is None:
+                self._start = time.monotonic()
+
+        delay = self._start + (timestamp - self.origin) / self.speed - time.monotonic()
+        if delay > 0:
+            return not stop_event.wait(delay)
+        return not stop_event.is_set()
+
+
+class ReplaySession:
+    """A recorded session loaded from recorder logs, split into CAN, LIN and ADC streams."""
+
+    def __init__(self, path, speed=1.0):
+        path = os.path.expanduser(path)
+        self.files = sorted(glob.glob(os.path.join(path, "*.vlog"))) if os.path.isdir(path) else [path]
+        if not self.files:
+            raise FileNotFoundError(f"No recorder logs found in '{path}'")
+
+        self.can = []   # (timestamp, channel, can.Message)
+        self.lin = []   # (timestamp, bytes)
+        self.adc = []   # (timestamp, app_id, voltage)
+
+        for file in self.files:
+            for timestamp, channel, kind, arbitration_id, flags, data in read_log(file):
+                if kind == KIND_CAN:
+                    msg = can.Message(
+                        timestamp=timestamp,
+                        arbitration_id=arbitration_id,
+                        is_extended_id=bool(flags & FLAG_EXTENDED),
+                        is_remote_frame=bool(flags & FLAG_REMOTE),
+                        is_fd=bool(flags & FLAG_FD),
+                        data=data
+                    )
+                    self.can.append((timestamp, channel, msg))
+                elif kind == KIND_LIN:
+                    self.lin.append((timestamp, data))
+                elif kind == KIND_ADC:
+                    self.adc.append((timestamp, channel.split(":", 1)[-1], ADC_SAMPLE.unpack(data)[0]))
+
+        for stream in (self.can, self.lin, self.adc):
+            stream.sort(key=lambda record: record[0])
+
+        starts = [stream[0][0] for stream in (self.can, self.lin, self.adc) if stream]
+        self.clock = ReplayClock(min(starts) if starts else 0.0, speed)
+
+    def __str__(self):
+        return f"{len(self.files)} file(s): {len(self.can)} CAN frames, {len(self.lin)} LIN chunks, {len(self.adc)} ADC samples"
+
+
+class ReplayThread(threading.Thread):
+    """Plays the CAN frames of a session onto virtual buses named like the recorded channels.
+
+    CANThread opens its interfaces as virtual buses in replay mode, so frames
+    go through the real Notifier and CANListener.
+    """
+
+    def __init__(self, logger):
+        super(ReplayThread, self).__init__()
+        self.logger = logger
+        self._stop_event = threading.Event()
+        self.daemon = True
+        self.buses = {}
+
+    def run(self):
+        session = shared_state.replay
+        if not session:
+            self.logger.error("Replay thread started without a replay session.")
+            return
+
+        self.logger.info(f"Replaying CAN frames from {session}")
+        try:
+            start = time.monotonic()
+            for timestamp, channel, msg in session.can:
+                if not session.clock.wait_until(timestamp, self._stop_event):
+                    break
+
+                bus = self.buses.get(channel)
+                if bus is None:
+                    bus = can.interface.Bus(channel=channel, bustype="virtual")
+                    self.buses[channel] = bus
+                bus.send(msg)
+
+            self.logger.info(f"CAN replay finished after {time.monotonic() - start:.2f}s")
+        except Exception as e:
+            self.logger.error(f"Error during CAN replay: {e}")
+        finally:
+            for bus in self.buses.values():
+                bus.shutdown()
+
+    def stop_thread(self):
+        time.sleep(.5)
+        self._stop_event.set()
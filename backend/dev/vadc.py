@@ -0,0 +1,101 @@
+import math
+import random
+import time
+
+from ..adcEngine import CLOCK_TOLERANCE, FULL_SCALE
+
+WAVEFORMS = ("constant", "sine", "ramp", "square", "walk")
+
+
+class Waveform:
+    """Simulated input voltage of one channel over time.
+
+    Configured per sensor with a "simulation" block in adc.json, e.g.
+    {"waveform": "sine", "min": 0.5, "max": 4.5, "period": 10, "noise": 0.01, "spikes": 0.001}.
+    `noise` is the standard deviation of added gaussian noise in volts,
+    `spikes` the probability of a sample jumping to a random voltage.
+    """
+
+    def __init__(self, waveform="sine", minimum=0.5, maximum=4.5, period=10.0, noise=0.01, spikes=0.0):
+        if waveform not in WAVEFORMS:
+            raise ValueError(f"waveform must be one of {', '.join(WAVEFORMS)}, not '{waveform}'")
+        if period <= 0:
+            raise ValueError(f"period must be positive, not {period}")
+
+        self.waveform = waveform
+        self.minimum = minimum
+        self.maximum = maximum
+        self.period = period
+        self.noise = noise
+        self.spikes = spikes
+        self.phase = random.random() * period  # channels don't move in lockstep
+        self.walk = (minimum + maximum) / 2
+
+    @classmethod
+    def from_settings(cls, settings):
+        settings = settings or {}
+        return cls(
+            waveform=settings.get("waveform", "sine"),
+            minimum=float(settings.get("min", 0.5)),
+            maximum=float(settings.get("max", 4.5)),
+            period=float(settings.get("period", 10.0)),
+            noise=float(settings.get("noise", 0.01)),
+            spikes=float(settings.get("spikes", 0.0)),
+        )
+
+    def voltage(self, now):
+        if self.spikes and random.random() < self.spikes:
+            return random.uniform(0.0, FULL_SCALE[1])
+
+        span = self.maximum - self.minimum
+        position = ((now + self.phase) % self.period) / self.period
+
+        if self.waveform == "constant":
+            value = self.minimum
+        elif self.waveform == "sine":
+            value = self.minimum + span * (0.5 + 0.5 * math.sin(2 * math.pi * position))
+        elif self.waveform == "ramp":
+            value = self.minimum + span * position
+        elif self.waveform == "square":
+            value = self.maximum if position < 0.5 else self.minimum
+        else:
+            # random walk that takes about one period to cross the range
+            self.walk += random.gauss(0.0, span / 20)
+            self.walk = min(self.maximum, max(self.minimum, self.walk))
+            value = self.walk
+
+        if self.noise:
+            value += random.gauss(0.0, self.noise)
+        return value
+
+
+class SimulatedADC:
+    """Stands in for an ADS1x15 (select/read/period) and returns Waveform voltages.
+
+    The data rate is not limited to the real chip's settings, so the engine
+    can be driven at thousands of samples per second for load tests.
+    """
+
+    def __init__(self, data_rate=860, gain=1):
+        if data_rate <= 0:
+            raise ValueError(f"data rate must be positive, not {data_rate}")
+        self.data_rate = data_rate
+        self.period = CLOCK_TOLERANCE / data_rate
+        self.full_scale = FULL_SCALE[gain]
+        self.waveforms = {}     # mux -> Waveform
+        self.mux = None
+        self.reads = 0
+
+    def set_waveform(self, mux, waveform):
+        self.waveforms[mux] = waveform
+
+    def select(self, mux):
+        self.mux = mux
+
+    def read(self):
+        self.reads += 1
+        waveform = self.waveforms.get(self.mux)
+        if waveform is None:
+            return 0.0
+        # clipped to the full scale range like the real converter
+        return min(self.full_scale, max(-self.full_scale, waveform.voltage(time.monotonic())))
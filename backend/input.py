@@ -0,0 +1,97 @@
+import queue
+import threading
+import time
+
+from . import settings
+from .buttonHandler import ButtonHandler
+from .shared.shared_state import shared_state
+
+IDLE_WAIT = 1.0     # seconds to wait for input while no button is held
+
+dropped_events = 0
+
+
+def post_input(source, button_name):
+    """Queue a decoded control frame for the input thread, never blocks the caller.
+
+    `source` is "can" or "lin", `button_name` the mapped button or None for an
+    unknown frame. Events are dropped if the input thread is not keeping up.
+    """
+    global dropped_events
+    try:
+        shared_state.input_queue.put_nowait((source, button_name, time.monotonic()))
+    except queue.Full:
+        dropped_events += 1
+
+
+class InputThread(threading.Thread):
+    """Owns the ButtonHandlers (and their uinput devices) of the CAN and LIN controls.
+
+    The CAN Notifier and the LIN reader only decode control frames and post
+    them with post_input, all uinput writes happen on this thread. While a
+    button is held the thread wakes up exactly at the next long-press or
+    release deadline of its handlers, so timing does not depend on bus traffic.
+    """
+
+    def __init__(self, logger):
+        super(InputThread, self).__init__()
+        self.logger = logger
+
+        self._stop_event = threading.Event()
+        self.daemon = True
+
+        can_controls = (settings.load_settings("can") or {}).get("controls", {})
+        lin_settings = settings.load_settings("lin") or {}
+
+        self.handler_settings = {
+            "can": self._handler_settings(can_controls),
+            "lin": self._handler_settings(lin_settings),
+        }
+        self.handlers = {}  # created on the first event of a source
+
+    def run(self):
+        while not self._stop_event.is_set():
+            try:
+                source, button_name, received_at = shared_state.input_queue.get(timeout=self._wait_time())
+                self._handler(source).handle(button_name, received_at)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                self.logger.error(f"Error handling input: {e}")
+
+            for handler in self.handlers.values():
+                handler.poll()
+
+    def _wait_time(self):
+        deadlines = [handler.next_deadline() for handler in self.handlers.values()]
+        deadlines = [deadline for deadline in deadlines if deadline is not None]
+        if not deadlines:
+            return IDLE_WAIT
+        return min(IDLE_WAIT, max(0.0, min(deadlines) / 1000 - time.monotonic()))
+
+    def _handler_settings(self, source_settings):
+        return {
+            "click_timeout": source_settings.get("click_timeout", 300),
+            "long_press_duration": source_settings.get("long_press_duration", 2000),
+            "mouse_speed": source_settings.get("mouse_speed", 8),
+            "mouse_rate": source_settings.get("mouse_rate", 120),
+            "mouse_acceleration": source_settings.get("mouse_acceleration", 1.5),
+            "mouse_max_factor": source_settings.get("mouse_max_factor", 4.0),
+        }
+
+    def _handler(self, source):
+        handler = self.handlers.get(source)
+        if handler is None:
+            handler = ButtonHandler(**self.handler_settings[source])
+            self.handlers[source] = handler
+        return handler
+
+    def stop_thread(self):
+        self._stop_event.set()
+        for source, handler in self.handlers.items():
+            latency = handler.latency_stats()
+            if latency:
+                self.logger.info(f"Input {source}: input to uinput latency p50 {latency['p50_ms']}ms, "
+                                 f"p99 {latency['p99_ms']}ms, max {latency['max_ms']}ms over {latency['count']} inputs")
+        if dropped_events:
+            self.logger.info(f"Input: {dropped_events} control events dropped")
@@ -4,38 +4,132 @@ import sys
 import serial
 from enum import Enum, auto
 from pathlib import Path
-from .buttonHandler import ButtonHandler
+from .input import post_input
 from . import settings
+from .recorder import KIND_LIN
 from .shared.shared_state import shared_state
 
+READ_TIMEOUT = 0.05     # seconds a serial read blocks while the bus is quiet
+
 class Config:
     def __init__(self):
         self.lin_settings = settings.load_settings("lin")
 
-class LinFrame:
-    kMaxBytes = 8
+# Data length per frame id (PID & 0x3F) as defined by LIN 1.x: ids 0-31 carry 2 bytes, 32-47 4 and 48-63 8
+FRAME_LENGTHS = [2] * 32 + [4] * 16 + [8] * 16
+
+# Parser states
+IDLE, BREAK, PID, DATA = range(4)
+
+CHECKSUM_MODES = ("classic", "enhanced", "auto")
+
+
+def pid_parity_ok(pid):
+    """Check the two parity bits of a protected identifier."""
+    bits = [(pid >> i) & 1 for i in range(6)]
+    p0 = bits[0] ^ bits[1] ^ bits[2] ^ bits[4]
+    p1 = 1 - (bits[1] ^ bits[3] ^ bits[4] ^ bits[5])
+    return pid >> 6 == (p1 << 1 | p0)
+
+
+VALID_PIDS = [pid_parity_ok(pid) for pid in range(256)]
+
+
+def lin_checksum(data, pid=None):
+    """Classic checksum over the data, or enhanced checksum when the PID is given."""
+    total = pid or 0
+    for byte in data:
+        total += byte
+        if total > 0xFF:
+            total -= 0xFF
+    return ~total & 0xFF
 
-    def __init__(self):
-        self.bytes = bytearray()
 
-    def append_byte(self, b):
-        self.bytes.append(b)
+class LinParser:
+    """Byte-level state machine splitting the UART stream into LIN frames.
 
-    def get_byte(self, index):
-        if 0 <= index < len(self.bytes):
-            return self.bytes[index]
+    A frame starts with a break (read as 0x00) and the sync byte, followed by
+    the PID, the data bytes and the checksum. The data length follows from the
+    frame id, so a frame is complete as soon as its checksum arrives.
+    `on_frame` is called with the bytes after the sync: PID, data, checksum.
 
-    def pop_byte(self):
-        return self.bytes.pop()
+    Frames with a bad PID parity or checksum are dropped. The parser then
+    resyncs by searching the dropped bytes for the next break and sync, which
+    also recovers from headers nobody answered.
+    """
 
-    def num_bytes(self):
-        return len(self.bytes)
+    def __init__(self, sync_id, on_frame, checksum="classic"):
+        if checksum not in CHECKSUM_MODES:
+            raise ValueError(f"checksum must be one of {', '.join(CHECKSUM_MODES)}, not '{checksum}'")
 
-    def reset(self):
-        self.bytes.clear()
+        self.sync_id = sync_id
+        self.on_frame = on_frame
+        self.checksum = checksum
 
-    def is_valid(self):
-        return len(self.bytes) >= 6
+        self.state = IDLE
+        self.frame = bytearray()
+        self.expected = 0
+
+        # Bus statistics
+        self.frames = 0
+        self.checksum_errors = 0
+        self.parity_errors = 0
+        self.resyncs = 0
+
+    def feed(self, data):
+        state = self.state
+        frame = self.frame
+        sync_id = self.sync_id
+
+        for byte in data:
+            if state == DATA:
+                frame.append(byte)
+                if len(frame) == self.expected:
+                    state = IDLE
+                    if self._checksum_ok(frame):
+                        self.frames += 1
+                        self.on_frame(bytes(frame))
+                    else:
+                        self.checksum_errors += 1
+                        state = self._resync(bytes(frame[1:]))
+            elif state == IDLE:
+                if byte == 0x00:
+                    state = BREAK
+            elif state == BREAK:
+                if byte == sync_id:
+                    state = PID
+                elif byte != 0x00:
+                    state = IDLE
+            else:  # PID
+                if not VALID_PIDS[byte]:
+                    self.parity_errors += 1
+                    self.resyncs += 1
+                    state = BREAK if byte == 0x00 else IDLE
+                    continue
+
+                frame.clear()
+                frame.append(byte)
+                self.expected = FRAME_LENGTHS[byte & 0x3F] + 2  # PID + data + checksum
+                state = DATA
+
+        self.state = state
+
+    def _checksum_ok(self, frame):
+        checksum = frame[-1]
+        data = frame[1:-1]
+        if self.checksum != "enhanced" and checksum == lin_checksum(data):
+            return True
+        # diagnostic frames (ids 60 and 61) always use the classic checksum
+        if self.checksum != "classic" and frame[0] & 0x3F < 60 and checksum == lin_checksum(data, frame[0]):
+            return True
+        return False
+
+    def _resync(self, data):
+        # Parse the bytes of a rejected frame again, a header may start inside them
+        self.resyncs += 1
+        self.state = IDLE
+        self.feed(data)
+        return self.state
 
 
 class LINThread(threading.Thread):
@@ -44,32 +138,36 @@ class LINThread(threading.Thread):
         self.logger = logger
         
         self.config = Config()
-        self.lin_frame = LinFrame()
         self.lin_serial = None
 
         self._stop_event = threading.Event()
         self.daemon = True
         lin_settings = self.config.lin_settings
 
-
-
-        # Button and joystick mappings
-        self.button_mappings = self._parse_command_mappings(
-            lin_settings["commands"]["button"]
-        )
-        self.joystick_mappings = self._parse_command_mappings(
-            lin_settings["commands"]["joystick"]
+        # Frame ids, parsed once
+        self.swm_id = self._parse_id(lin_settings["swm_id"])
+        self.zero_code = self._parse_id(lin_settings["zero_code"])
+        self.control_held = False   # set while a button is held, so the release is posted once
+        self.parser = LinParser(
+            self._parse_id(lin_settings["sync_id"]) or 0x55,
+            self._handle_frame,
+            lin_settings.get("checksum", "classic")
         )
 
-        self.click_timeout = lin_settings.get("click_timeout", 300)
-        self.long_press_duration = lin_settings.get("long_press_duration", 2000)
-        self.mouse_speed = lin_settings.get("mouse_speed", 8)
+        # Bus statistics besides the parser counters
+        self.unknown_commands = 0
+        self._rate_frames = 0
+        self._rate_at = time.monotonic()
+        self._frames_per_second = 0.0
 
-        self.button_handler = ButtonHandler(
-            self.click_timeout,
-            self.long_press_duration,
-            self.mouse_speed
-        )
+        # Button and joystick mappings, keyed by PID and the first 4 data bytes
+        self.command_mappings = {
+            **self._parse_command_mappings(lin_settings["commands"]["joystick"]),
+            **self._parse_command_mappings(lin_settings["commands"]["button"]),
+        }
+
+        # Record raw bytes into the session log when V-Link runs with --record
+        self.recorder_channel = shared_state.recorder.channel_index("lin") if shared_state.recorder else None
 
 
     def _parse_command_mappings(self, commands):
@@ -78,13 +176,36 @@ class LINThread(threading.Thread):
             for name, command in commands.items()
         }
 
+    def _parse_id(self, value):
+        return int(value, 16) if value else None
+
+    def stats(self):
+        """Frame rate and error counters of the bus."""
+        now = time.monotonic()
+        elapsed = now - self._rate_at
+        if elapsed >= 1.0:
+            self._frames_per_second = (self.parser.frames - self._rate_frames) / elapsed
+            self._rate_frames = self.parser.frames
+            self._rate_at = now
+
+        return {
+            "frames": self.parser.frames,
+            "frames_per_second": round(self._frames_per_second, 1),
+            "checksum_errors": self.parser.checksum_errors,
+            "parity_errors": self.parser.parity_errors,
+            "resyncs": self.parser.resyncs,
+            "unknown_commands": self.unknown_commands,
+        }
+
 
     def run(self):
         try:
-            if not shared_state.vLin:
+            if shared_state.replay:
+                self._read_from_replay()
+            elif not shared_state.vLin:
                 port = "/dev/ttyAMA0" if shared_state.rpiModel == 5 else "/dev/ttyS0"
                 try:
-                    self.lin_serial = serial.Serial(port=port, baudrate=9600, timeout=1)
+                    self.lin_serial = serial.Serial(port=port, baudrate=9600, timeout=READ_TIMEOUT)
                 except Exception as e:
                     self.logger.error(f"UART error: {e}")
                 
@@ -105,6 +226,11 @@ class LINThread(threading.Thread):
         time.sleep(.5)
         self._stop_event.set()
 
+        stats = self.stats()
+        self.logger.info(f"LIN: {stats['frames']} frames, {stats['checksum_errors']} checksum errors, "
+                         f"{stats['parity_errors']} parity errors, {stats['resyncs']} resyncs, "
+                         f"{stats['unknown_commands']} unknown commands")
+
         if self.lin_serial and self.lin_serial.is_open:
             self.lin_serial.close()
 
@@ -115,11 +241,17 @@ class LINThread(threading.Thread):
         try:
             while not self._stop_event.is_set():
                 if self.lin_serial and self.lin_serial.is_open:
-                    if self.lin_serial.in_waiting > 0:
-                        self._process_incoming_byte(self.lin_serial.read(1))
-                        self.button_handler.timeout_button()
-                    else:
-                        time.sleep(0.1)
+                    # Everything that is buffered, or block until the next byte arrives
+                    data = self.lin_serial.read(self.lin_serial.in_waiting or 1)
+                    if not data:
+                        continue
+
+                    if self.recorder_channel is not None:
+                        now = time.time()
+                        for i in range(0, len(data), 8):
+                            shared_state.recorder.append(KIND_LIN, self.recorder_channel, now, 0, 0, data[i:i + 8])
+
+                    self.parser.feed(data)
                 else:
                     break
         except KeyboardInterrupt:
@@ -138,51 +270,41 @@ class LINThread(threading.Thread):
                 for line in file:
                     if self._stop_event.is_set():
                         break
-                    frame_data = [int(byte, 16) for byte in line.strip().split()]
-                    for byte in frame_data:
-                        self._process_incoming_byte(byte.to_bytes(1, 'big'))
+                    self.parser.feed(bytes.fromhex(line))
                     time.sleep(0.1)
         except KeyboardInterrupt:
             self.logger.info("Replay stopped by user.")
 
 
-    def _process_incoming_byte(self, byte):
-        try:
-            if not byte:  # Check for empty data
-                return
-            
-            n = self.lin_frame.num_bytes()
-            sync_id = bytes.fromhex(self.config.lin_settings["sync_id"][2:])
-
-            if byte == sync_id and n > 2 and self.lin_frame.get_byte(n - 1) == 0x00:
-                self.lin_frame.pop_byte()
-                self._handle_frame()
-                self.lin_frame.reset()
-            elif n == self.lin_frame.kMaxBytes:
-                self.lin_frame.reset()
-            else:
-                if byte:
-                    self.lin_frame.append_byte(byte[0] if isinstance(byte, bytes) else byte)
-                elif shared_state.verbose:
-                    self.logger.info("Empty byte, not adding to lin frame")
-        except IndexError as e:
-            self.logger.error(f"IndexError: {e} while processing incoming bytes.")
-
-    def _handle_frame(self):
-        swm_id = bytes.fromhex(self.config.lin_settings["swm_id"][2:])
-                
-        if self.lin_frame.get_byte(0) != swm_id[0]:
-            return
+    def _read_from_replay(self):
+        session = shared_state.replay
+        self.logger.info(f"Replaying {len(session.lin)} LIN chunks from recorded session...")
+
+        for timestamp, data in session.lin:
+            if not session.clock.wait_until(timestamp, self._stop_event):
+                break
+            self.parser.feed(data)
 
-        zero_code = bytes.fromhex(self.config.lin_settings["zero_code"][2:])
-        if self.lin_frame.get_byte(5) == zero_code[0]:
+        self.logger.info("LIN replay finished.")
+
+
+    def _handle_frame(self, frame):
+        # frame: PID, data, checksum
+        if frame[0] != self.swm_id:
             return
 
-        if not self.lin_frame.is_valid():
+        if frame[-1] == self.zero_code:
+            # Buttons released, stops mouse motion right away
+            if self.control_held:
+                self.control_held = False
+                post_input("lin", None)
             return
 
-        frame_data = b"".join(self.lin_frame.get_byte(i).to_bytes(1, 'big') for i in range(5))
-        button_name = self.button_mappings.get(frame_data) or self.joystick_mappings.get(frame_data) 
-        
+        button_name = self.command_mappings.get(frame[:5])
+        if button_name is None:
+            self.unknown_commands += 1
+        else:
+            self.control_held = True
+
         print(button_name)
-        self.button_handler.handle(button_name)
+        post_input("lin", button_name)
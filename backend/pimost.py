@@ -3,12 +3,12 @@ import time
 import sys
 import os
 import subprocess
-import socketio
 import serial
 import struct
 from threading import Thread
 from serial.tools import list_ports
 from .shared.shared_state import shared_state
+from .shared.event_bus import event_bus
 import time
 
 # pymost-client implementation, replaced timer with thread
@@ -98,7 +98,6 @@ class PiMOSTThread(threading.Thread):
         self.logger = logger
         
         self.pimost = PiMost(self.recv_most_message, logger)
-        self.client = socketio.Client()
         self._stop_event = threading.Event()
         self.daemon = True
 
@@ -107,10 +106,6 @@ class PiMOSTThread(threading.Thread):
     def run(self):
         try:
             while not self._stop_event.is_set():
-                # Connect to socketIO 
-                if not self.client.connected:
-                    self.connect_to_socketio()
-                
                 # Connect to PiMost
                 if not self.pimost.connected:
                     self.pimost.find_port()           
@@ -120,24 +115,9 @@ class PiMOSTThread(threading.Thread):
         except KeyboardInterrupt:
             pass
 
-    def connect_to_socketio(self):
-        max_retries = 10
-        current_retry = 0
-        while not self._stop_event.is_set() and not self.client.connected and current_retry < max_retries:
-            try:
-                self.client.connect('http://localhost:4001', namespaces=['/most'])
-            except Exception as e:
-                self.logger.error(f"Socket.IO connection failed. Retry {current_retry}/{max_retries}. Error: {e}")
-                time.sleep(.5)
-                current_retry += 1
-        if self.client.connected:
-            self.logger.info("PiMost connected to Socket.IO.")
-        else:
-            self.logger.error("PiMost failed to connect to Socket.IO.")
-
     # callback from PiMost class
     def recv_most_message(self, most_message):
-        self.client.emit("most_message", most_message, namespace="/most")
+        event_bus.publish("/most", "most_message", most_message)
         self.logger.debug("PiMost message received")
 
 
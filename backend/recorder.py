@@ -0,0 +1,334 @@
+"""
+    Raw frame recorder with a compact binary log format.
+
+    File layout (little-endian):
+        header (1024 bytes):
+            magic "VLNKREC1", version (u16), record size (u16), channel count (u16), padding (u16)
+            63 channel names, 16 bytes each, zero padded
+        records (24 bytes each):
+            timestamp (f64, seconds since epoch), arbitration id (u32), flags (u8),
+            dlc (u8), channel index (u8), kind (u8), data (8 bytes, zero padded)
+
+    Files are preallocated to their maximum size, so a file cut off by a power
+    loss ends in zeroed records; readers stop at the first record with a zero
+    timestamp. Files are truncated to their real length when closed.
+
+    Besides CAN frames a log can hold raw LIN bytes and ADC samples, which
+    makes it a complete session for backend/dev/replay.py.
+
+    Convert a log to candump or Vector ASC text:
+        python -m backend.recorder ~/v-link/logs/can/can-20250101-120000-000.vlog --format asc
+"""
+
+import argparse
+import datetime
+import os
+import queue
+import struct
+import sys
+import threading
+import time
+
+import can
+
+MAGIC = b"VLNKREC1"
+VERSION = 1
+
+HEADER = struct.Struct("<8sHHH2x")
+NAME = struct.Struct("16s")
+RECORD = struct.Struct("<dIBBBB8s")
+
+MAX_CHANNELS = 63
+HEADER_SIZE = HEADER.size + MAX_CHANNELS * NAME.size  # 1024 bytes
+
+# Record kinds
+KIND_CAN = 0    # arbitration id, flags and up to 8 data bytes
+KIND_LIN = 1    # up to 8 raw bytes as read from the UART
+KIND_ADC = 2    # one voltage sample (ADC_SAMPLE), channel is "adc:<app_id>"
+
+ADC_SAMPLE = struct.Struct("<f")
+
+# CAN flags
+FLAG_EXTENDED = 0x01
+FLAG_REMOTE = 0x02
+FLAG_ERROR = 0x04
+FLAG_FD = 0x08
+
+
+class FrameLog:
+    """Append-only binary log fed from any thread.
+
+    Records are packed into a small pool of preallocated buffers. A writer
+    thread writes full buffers in one call (and partial ones every
+    `flush_interval` seconds) and rotates files at `max_file_size`, keeping
+    at most `max_files`. If the writer falls behind and no buffer is free,
+    records are counted as dropped instead of blocking the caller.
+    """
+
+    def __init__(self, directory, prefix="can", max_file_size=32 * 1024 * 1024, max_files=20,
+                 batch_records=1024, buffer_count=8, flush_interval=1.0, logger=None):
+        self.directory = os.path.expanduser(directory)
+        self.prefix = prefix
+        self.max_file_size = max(max_file_size, HEADER_SIZE + batch_records * RECORD.size)
+        self.max_files = max_files
+        self.batch_records = batch_records
+        self.flush_interval = flush_interval
+        self.logger = logger
+
+        self.channels = {}
+        self.recorded = 0
+        self.dropped = 0
+
+        self._free = queue.Queue()
+        for _ in range(buffer_count - 1):
+            self._free.put(bytearray(batch_records * RECORD.size))
+        self._full = queue.Queue()
+
+        self._current = bytearray(batch_records * RECORD.size)
+        self._count = 0
+        self._lock = threading.Lock()
+
+        self._file = None
+        self._file_size = 0
+        self._file_lock = threading.Lock()
+        self._sequence = 0
+
+        self._writer = threading.Thread(target=self._write_loop, daemon=True)
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        with self._file_lock:
+            self._open_file()
+        self._writer.start()
+
+    def close(self):
+        with self._lock:
+            self._swap()
+        self._full.put(None)
+        self._writer.join(timeout=5)
+
+        with self._file_lock:
+            self._close_file()
+
+        if self.logger:
+            self.logger.info(f"Recorder: {self.recorded} records written, {self.dropped} dropped")
+
+    def channel_index(self, name):
+        """Return the index of a channel name, registering it in the file header if needed."""
+        with self._file_lock:
+            if name not in self.channels:
+                if len(self.channels) >= MAX_CHANNELS:
+                    raise ValueError(f"Recorder supports at most {MAX_CHANNELS} channels")
+                self.channels[name] = len(self.channels)
+                if self._file:
+                    os.pwrite(self._file.fileno(), self._header(), 0)
+            return self.channels[name]
+
+    def append(self, kind, channel, timestamp, arbitration_id, flags, data):
+        with self._lock:
+            if self._current is None:
+                try:
+                    self._current = self._free.get_nowait()
+                except queue.Empty:
+                    self.dropped += 1
+                    return
+
+            RECORD.pack_into(self._current, self._count * RECORD.size,
+                             timestamp, arbitration_id, flags, len(data), channel, kind, data)
+            self._count += 1
+
+            if self._count == self.batch_records:
+                self._swap()
+
+    def _swap(self):
+        # called with self._lock held
+        if self._current is not None and self._count:
+            self._full.put((self._current, self._count))
+            self._current = None
+            self._count = 0
+
+            try:
+                self._current = self._free.get_nowait()
+            except queue.Empty:
+                pass
+
+    def _write_loop(self):
+        while True:
+            try:
+                item = self._full.get(timeout=self.flush_interval)
+            except queue.Empty:
+                with self._lock:
+                    self._swap()
+                continue
+
+            if item is None:
+                break
+
+            buffer, count = item
+            try:
+                with self._file_lock:
+                    self._write(memoryview(buffer)[:count * RECORD.size])
+                self.recorded += count
+            except OSError as e:
+                self.dropped += count
+                if self.logger:
+                    self.logger.error(f"Recorder write failed: {e}")
+            finally:
+                self._free.put(buffer)
+
+        # write what is left after the stop sentinel
+        while not self._full.empty():
+            item = self._full.get_nowait()
+            if item:
+                with self._file_lock:
+                    self._write(memoryview(item[0])[:item[1] * RECORD.size])
+                self.recorded += item[1]
+
+    def _write(self, data):
+        if self._file_size + len(data) > self.max_file_size:
+            self._close_file()
+            self._open_file()
+        self._file.write(data)
+        self._file_size += len(data)
+
+    def _header(self):
+        names = [name.encode()[:NAME.size] for name in self.channels]
+        names += [b""] * (MAX_CHANNELS - len(names))
+        return HEADER.pack(MAGIC, VERSION, RECORD.size, len(self.channels)) + b"".join(NAME.pack(name) for name in names)
+
+    def _open_file(self):
+        timestamp = time.strftime("%Y%m%d-%H%M%S")
+        path = os.path.join(self.directory, f"{self.prefix}-{timestamp}-{self._sequence:03d}.vlog")
+        self._sequence += 1
+
+        self._file = open(path, "wb", buffering=0)
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(self._file.fileno(), 0, self.max_file_size)
+            except OSError:
+                pass  # not supported by this filesystem, grow on demand
+
+        self._file.write(self._header())
+        self._file_size = HEADER_SIZE
+        self._apply_retention()
+
+    def _close_file(self):
+        if self._file:
+            self._file.truncate(self._file_size)
+            self._file.close()
+            self._file = None
+
+    def _apply_retention(self):
+        logs = sorted(
+            name for name in os.listdir(self.directory)
+            if name.startswith(self.prefix + "-") and name.endswith(".vlog")
+        )
+        for name in logs[:-self.max_files]:
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError as e:
+                if self.logger:
+                    self.logger.error(f"Recorder could not remove old log '{name}': {e}")
+
+
+class CANRecorder(can.Listener):
+    """Notifier listener writing every received frame of one channel into a FrameLog."""
+
+    def __init__(self, frame_log, channel):
+        self.frame_log = frame_log
+        self.channel = frame_log.channel_index(channel)
+
+    def on_message_received(self, msg):
+        flags = ((FLAG_EXTENDED if msg.is_extended_id else 0) |
+                 (FLAG_REMOTE if msg.is_remote_frame else 0) |
+                 (FLAG_ERROR if msg.is_error_frame else 0) |
+                 (FLAG_FD if msg.is_fd else 0))
+        self.frame_log.append(KIND_CAN, self.channel, msg.timestamp, msg.arbitration_id, flags, msg.data)
+
+
+def read_log(path):
+    """Yield (timestamp, channel, kind, arbitration_id, flags, data) for every record in a log file."""
+    with open(path, "rb") as file:
+        header = file.read(HEADER_SIZE)
+        magic, version, record_size, channel_count = HEADER.unpack_from(header)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            raise ValueError(f"'{path}' is not a V-Link recorder log")
+
+        channels = [
+            NAME.unpack_from(header, HEADER.size + i * NAME.size)[0].rstrip(b"\0").decode()
+            for i in range(channel_count)
+        ]
+
+        while True:
+            chunk = file.read(RECORD.size * 4096)
+            for timestamp, arbitration_id, flags, dlc, channel, kind, data in RECORD.iter_unpack(chunk[:len(chunk) - len(chunk) % RECORD.size]):
+                if timestamp == 0:
+                    return  # preallocated, never written
+                name = channels[channel] if channel < len(channels) else str(channel)
+                yield timestamp, name, kind, arbitration_id, flags, data[:dlc]
+            if len(chunk) < RECORD.size * 4096:
+                return
+
+
+def to_candump(records):
+    """Format CAN records like `candump -L`."""
+    for timestamp, channel, kind, arbitration_id, flags, data in records:
+        if kind != KIND_CAN:
+            continue
+        can_id = f"{arbitration_id:08X}" if flags & FLAG_EXTENDED else f"{arbitration_id:03X}"
+        payload = "R" if flags & FLAG_REMOTE else data.hex().upper()
+        yield f"({timestamp:.6f}) {channel} {can_id}#{payload}"
+
+
+def to_asc(records):
+    """Format CAN records as a Vector ASC log."""
+    start = None
+    channels = {}
+    for timestamp, channel, kind, arbitration_id, flags, data in records:
+        if kind != KIND_CAN:
+            continue
+
+        if start is None:
+            start = timestamp
+            date = datetime.datetime.fromtimestamp(start).strftime("%a %b %d %I:%M:%S.%f")[:-3]
+            year = datetime.datetime.fromtimestamp(start).strftime("%p %Y")
+            yield f"date {date} {year}"
+            yield "base hex  timestamps absolute"
+            yield "internal events logged"
+            yield "Begin Triggerblock"
+
+        number = channels.setdefault(channel, len(channels) + 1)
+        can_id = f"{arbitration_id:X}x" if flags & FLAG_EXTENDED else f"{arbitration_id:X}"
+        if flags & FLAG_REMOTE:
+            yield f"{timestamp - start:>11.6f} {number}  {can_id:<15} Rx   r"
+        else:
+            payload = " ".join(f"{byte:02X}" for byte in data)
+            yield f"{timestamp - start:>11.6f} {number}  {can_id:<15} Rx   d {len(data)} {payload}"
+
+    if start is not None:
+        yield "End TriggerBlock"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert V-Link recorder logs to text")
+    parser.add_argument("files", nargs="+", help="Recorder log files (.vlog), converted in the given order")
+    parser.add_argument("--format", choices=["candump", "asc"], default="candump", help="Output format")
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    def records():
+        for path in args.files:
+            yield from read_log(path)
+
+    formatter = to_asc if args.format == "asc" else to_candump
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        for line in formatter(records()):
+            output.write(line + "\n")
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,19 @@ import os
 import time
 import subprocess
 import eventlet
+from eventlet               import tpool
+from eventlet.hubs          import trampoline
 
-from flask                  import Flask, send_from_directory, render_template
-from flask_socketio         import SocketIO
+from flask                  import Flask, send_from_directory, render_template, request, jsonify, abort
+from flask_socketio         import SocketIO, emit, join_room, leave_room
 from flask_cors             import CORS
 
 from .                      import settings
 from .shared.shared_state   import shared_state
+from .shared.wire           import SensorIndex, encode_batch
+from .shared.event_bus      import event_bus
+from .shared.history        import History
+from .canScheduler          import format_latency_report
 
 import logging
 logger = logging.getLogger("vlink")
@@ -25,6 +31,29 @@ socketio = SocketIO(server, cors_allowed_origins="*", async_mode='eventlet')
 # Define modules
 modules = ["app", "mmi", "can", "lin", "adc", "rti", "most"]
 
+# Handlers for events published by backend threads on the event bus, keyed by (namespace, event)
+bus_handlers = {}
+
+# Last-value tables per namespace: app_id -> {value, timestamp, source}
+snapshots = {}
+
+# Downsampled value history per namespace, see shared/history.py
+histories = {}
+HISTORY_SPAN = 600          # seconds returned when a query has no start
+HISTORY_POINTS = 500        # default number of points per query
+
+# Fill in the defaults of a history query: the last HISTORY_SPAN seconds, HISTORY_POINTS points
+# Raises ValueError for a malformed query, a missing query counts as empty
+def history_args(args):
+    if args is None:
+        args = {}
+    if not hasattr(args, 'get'):
+        raise ValueError('query must be an object')
+    end = float(args.get('end') or time.time())
+    start = float(args.get('start') or end - HISTORY_SPAN)
+    points = int(args.get('points') or HISTORY_POINTS)
+    return args.get('id'), start, end, points
+
 class ServerThread(threading.Thread):
     def __init__(self, logger):
         super().__init__()
@@ -44,6 +73,9 @@ class ServerThread(threading.Thread):
             # Handle ignition in a green thread
             eventlet.spawn(self.monitor_ignition_state)
 
+            # Forward data published by the backend threads
+            eventlet.spawn(self.drain_event_bus)
+
             # Keep the thread alive until stop_event is set
             while not self.stop_event.is_set():
                 eventlet.sleep(0.1)
@@ -62,6 +94,21 @@ class ServerThread(threading.Thread):
         except eventlet.StopServe:
             logger.info("Server stopped gracefully.")
 
+    def drain_event_bus(self):
+        while not self.stop_event.is_set():
+            for namespace, event, data in event_bus.drain():
+                try:
+                    handler = bus_handlers.get((namespace, event))
+                    if handler:
+                        handler(data)
+                    else:
+                        socketio.emit(event, data, namespace=namespace)
+                except Exception as e:
+                    logger.error(f"Error emitting {event} on {namespace}: {e}")
+
+            # Sleep until a backend thread publishes (or stop_thread wakes us)
+            trampoline(event_bus.fileno(), read=True)
+
     def stop_thread(self):
         if shared_state.verbose:
             time.sleep(.5)
@@ -69,6 +116,7 @@ class ServerThread(threading.Thread):
         # Raise StopServe to terminate the WSGI server loop
         eventlet.spawn(self.server_socket.close)
         self.stop_event.set()
+        event_bus.wake()
 
     def monitor_ignition_state(self):
         previous_ignStatus = None  # Variable to track the previous state of shared_state.ign
@@ -122,9 +170,80 @@ class ServerThread(threading.Thread):
         namespace = f'/{module}'
         toggle_attr = f'toggle_{module}'
 
+        # Clients that negotiated the binary data format (see shared/wire.py)
+        binary_clients = set()
+        sensor_index = SensorIndex()
+
+        # Last value per app_id, sent to clients as one snapshot when they connect
+        last_values = {}
+        snapshots[namespace] = last_values
+
+        history = History()
+        histories[namespace] = history
+
         # Emit module Data
         def emit_data(data):
-            socketio.emit('data', data, namespace=namespace)
+            if isinstance(data, dict):
+                now = time.time()
+                source = 'replay' if shared_state.replay else module
+                for app_id, value in data.items():
+                    last_values[app_id] = {'value': value, 'timestamp': now, 'source': source}
+                history.record(data, now)
+
+            if isinstance(data, dict) and binary_clients:
+                new_ids = sensor_index.missing(data)
+                payload = encode_batch(data, sensor_index)
+                if new_ids:
+                    socketio.emit('format', {'format': 'binary', 'ids': sensor_index.ids}, namespace=namespace, to='binary')
+                socketio.emit('data', payload, namespace=namespace, to='binary')
+                socketio.emit('data', data, namespace=namespace, to='text')
+            else:
+                socketio.emit('data', data, namespace=namespace)
+
+        # Every client starts with the text format and gets the last known values
+        def handle_connect():
+            join_room('text')
+            if last_values:
+                emit('snapshot', last_values)
+
+        # Send the last known values on request
+        def send_snapshot():
+            emit('snapshot', last_values)
+
+        # Query the history of one sensor: {"id", "start", "end", "points"}, times in epoch seconds
+        def send_history(args=None):
+            try:
+                app_id, start, end, points = history_args(args)
+                if not app_id:
+                    raise ValueError("missing 'id'")
+            except (TypeError, ValueError) as e:
+                emit('history', {'id': args.get('id') if isinstance(args, dict) else None, 'error': f'Invalid history query: {e}'})
+                return
+
+            result = tpool.execute(history.query, app_id, start, end, points)
+            result['id'] = app_id
+            emit('history', result)
+
+        def handle_disconnect():
+            binary_clients.discard(request.sid)
+
+        # Negotiate data format, 'binary' or 'text'
+        def set_format(data_format):
+            if data_format == 'binary':
+                if not sensor_index.ids:
+                    module_settings = settings.load_settings(module) or {}
+                    for sensor in module_settings.get('sensors', {}).values():
+                        sensor_index.add(sensor['app_id'])
+
+                leave_room('text')
+                join_room('binary')
+                binary_clients.add(request.sid)
+                emit('format', {'format': 'binary', 'ids': sensor_index.ids})
+            else:
+                leave_room('binary')
+                join_room('text')
+                binary_clients.discard(request.sid)
+                emit('format', {'format': 'text'})
 
         # Save module settings
         def save_settings(data):
@@ -155,6 +274,11 @@ class ServerThread(threading.Thread):
         emit_state.__name__     = f'emit_status_{module}'
         toggle_state.__name__   = f'handle_toggle_{module}'
         emit_data.__name__      = f'handle_data_{module}'
+        handle_connect.__name__ = f'handle_connect_{module}'
+        handle_disconnect.__name__ = f'handle_disconnect_{module}'
+        set_format.__name__     = f'handle_format_{module}'
+        send_snapshot.__name__  = f'handle_snapshot_{module}'
+        send_history.__name__   = f'handle_history_{module}'
 
 
 
@@ -162,10 +286,31 @@ class ServerThread(threading.Thread):
         socketio.on_event('save', save_settings, namespace=namespace)
         socketio.on_event('ping', emit_state, namespace=namespace)
         socketio.on_event('data', emit_data, namespace=namespace)
+        bus_handlers[(namespace, 'data')] = emit_data
+        socketio.on_event('format', set_format, namespace=namespace)
+        socketio.on_event('snapshot', send_snapshot, namespace=namespace)
+        socketio.on_event('history', send_history, namespace=namespace)
+
+        socketio.on_event('connect', handle_connect, namespace=namespace)
+        socketio.on_event('disconnect', handle_disconnect, namespace=namespace)
 
         socketio.on_event('toggle', toggle_state, namespace=namespace)
         
 
+    # Route to query the history of one sensor, e.g. /history/can/map?start=...&end=...&points=...
+    @server.route('/history/<module>/<app_id>')
+    def serve_history(module, app_id):
+        history = histories.get(f'/{module}')
+        if history is None:
+            abort(404)
+        try:
+            _, start, end, points = history_args(request.args)
+        except ValueError:
+            abort(400)
+        result = tpool.execute(history.query, app_id, start, end, points)
+        result['id'] = app_id
+        return jsonify(result)
+
     # Register modules
     for module in modules:
         register_socketio(module)
@@ -204,6 +349,29 @@ class ServerThread(threading.Thread):
         else:
             logger.debug(f"Unknown action: {args}")
 
+    # Diagnostic request round-trip latency per sensor, 'text' returns the table used in the log
+    @socketio.on('latency', namespace='/can')
+    def handle_can_latency(data_format=None):
+        can_thread = shared_state.THREADS.get("can", None)
+        latency = can_thread.latency_stats() if can_thread and can_thread.is_alive() else {}
+
+        if data_format == 'text':
+            emit('latency', format_latency_report(latency))
+        else:
+            emit('latency', latency)
+
+    # LIN bus frame rate and error counters
+    @socketio.on('stats', namespace='/lin')
+    def handle_lin_stats():
+        lin_thread = shared_state.THREADS.get("lin", None)
+        emit('stats', lin_thread.stats() if lin_thread and lin_thread.is_alive() else {})
+
+    # Requested and achieved ADC samples/s per sensor
+    @socketio.on('stats', namespace='/adc')
+    def handle_adc_stats():
+        adc_thread = shared_state.THREADS.get("adc", None)
+        emit('stats', adc_thread.stats() if adc_thread and adc_thread.is_alive() else {})
+
     @socketio.on('force_switch', namespace='/most')
     def handle_force_switch():
         most_thread = shared_state.THREADS.get("pimost", None)
@@ -215,3 +383,5 @@ class ServerThread(threading.Thread):
     @socketio.on('most_message', namespace='/most')
     def print_most_message(args):
         logger.debug(f"Received most message on most namespace: {args}")
+
+    bus_handlers[('/most', 'most_message')] = print_most_message
@@ -0,0 +1,77 @@
+# batcher.py
+
+import threading
+import time
+
+from .deadband import Deadband
+from .event_bus import event_bus
+
+
+class DataBatcher(threading.Thread):
+    """Collects the latest value per app_id and emits them as one message at a fixed rate.
+
+    Values that are superseded before the next flush are dropped, so a sensor
+    replying at 50 Hz still costs at most `rate` messages per second. Values
+    of sensors with a deadband are filtered before they are collected.
+    Every value is written to the data log (if any) before that filtering.
+    """
+
+    def __init__(self, namespace, rate=30, publish=None, datalog=None):
+        super().__init__()
+        self.daemon = True
+
+        self.publish = publish or event_bus.publish
+        self.namespace = namespace
+        self.module = namespace.strip("/")
+        self.datalog = datalog
+        self.interval = 1.0 / rate
+
+        self.deadbands = {}
+
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def set_deadband(self, app_id, settings):
+        self.deadbands[app_id] = Deadband.from_settings(settings)
+
+    def put(self, app_id, value):
+        if self.datalog:
+            self.datalog.append(self.module, app_id, value)
+
+        deadband = self.deadbands.get(app_id)
+        if deadband is not None and not deadband.update(value, time.monotonic()):
+            return
+
+        with self._lock:
+            self._pending[app_id] = value
+
+    def stats(self):
+        """Emitted and suppressed update counts per app_id."""
+        return {
+            app_id: {"emitted": deadband.emitted, "suppressed": deadband.suppressed}
+            for app_id, deadband in self.deadbands.items()
+        }
+
+    def run(self):
+        next_flush = time.monotonic()
+        while not self._stop_event.is_set():
+            next_flush += self.interval
+            self.flush()
+
+            delay = next_flush - time.monotonic()
+            if delay > 0:
+                self._stop_event.wait(delay)
+            else:
+                next_flush = time.monotonic()  # fell behind, don't burst to catch up
+
+    def flush(self):
+        with self._lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, {}
+
+        self.publish(self.namespace, "data", batch)
+
+    def stop(self):
+        self._stop_event.set()
@@ -0,0 +1,69 @@
+# characteristic.py
+
+import numpy as np
+
+
+def parse_characteristic(characteristic):
+    """Turn a {"input": value} point table from the settings into sorted float arrays (inputs, values).
+
+    Raises ValueError for tables with less than two points or repeated inputs.
+    """
+    points = sorted((float(key), float(value)) for key, value in characteristic.items())
+    if len(points) < 2:
+        raise ValueError("characteristic needs at least two points")
+
+    inputs = np.array([point[0] for point in points])
+    values = np.array([point[1] for point in points])
+    if np.any(np.diff(inputs) == 0):
+        raise ValueError("characteristic has repeated inputs")
+    return inputs, values
+
+
+class CharacteristicTable:
+    """Point tables of several channels, linearly interpolated in one np.interp call.
+
+    The tables are laid out back to back on one input axis, each shifted past
+    the end of the previous one. Inputs are clamped to their own table first,
+    so a channel never reads into its neighbour and values outside a table
+    hold its first or last value.
+    """
+
+    def __init__(self):
+        self.tables = []
+        self.inputs = None
+        self.values = None
+        self.low = None
+        self.high = None
+        self.shift = None
+
+    def add(self, characteristic):
+        """Add a channel, return its index in the inputs passed to evaluate()."""
+        self.tables.append(parse_characteristic(characteristic))
+        self._build()
+        return len(self.tables) - 1
+
+    def _build(self):
+        inputs, values, shifts = [], [], []
+        position = 0.0
+        for table_inputs, table_values in self.tables:
+            shift = position - table_inputs[0]
+            inputs.append(table_inputs + shift)
+            values.append(table_values)
+            shifts.append(shift)
+            position = table_inputs[-1] + shift + 1.0  # gap between tables
+
+        self.inputs = np.concatenate(inputs)
+        self.values = np.concatenate(values)
+        self.low = np.array([table_inputs[0] for table_inputs, _ in self.tables])
+        self.high = np.array([table_inputs[-1] for table_inputs, _ in self.tables])
+        self.shift = np.array(shifts)
+
+    def evaluate(self, inputs):
+        """Values for one input per channel (array in add() order)."""
+        if not self.tables:
+            return np.empty(0)
+        return np.interp(np.clip(inputs, self.low, self.high) + self.shift, self.inputs, self.values)
+
+    def evaluate_one(self, index, value):
+        table_inputs, table_values = self.tables[index]
+        return float(np.interp(value, table_inputs, table_values))
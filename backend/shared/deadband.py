@@ -0,0 +1,50 @@
+# deadband.py
+
+DEFAULT_HEARTBEAT = 5.0  # seconds
+
+
+class Deadband:
+    """Change-only filter for one sensor.
+
+    A value is emitted when it differs from the last emitted value by more than
+    `absolute` or more than `relative` (fraction of the last value), or when
+    nothing was emitted for `heartbeat` seconds. With the defaults only
+    repeated identical values are suppressed.
+    """
+
+    __slots__ = ("absolute", "relative", "heartbeat", "last_value", "last_emit", "emitted", "suppressed")
+
+    def __init__(self, absolute=0.0, relative=0.0, heartbeat=DEFAULT_HEARTBEAT):
+        self.absolute = absolute
+        self.relative = relative
+        self.heartbeat = heartbeat
+
+        self.last_value = None
+        self.last_emit = 0.0
+
+        self.emitted = 0
+        self.suppressed = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Create a filter from a sensor's "deadband" block, e.g. {"absolute": 0.5, "heartbeat": 10}."""
+        settings = settings or {}
+        return cls(
+            absolute=float(settings.get("absolute", 0.0)),
+            relative=float(settings.get("relative", 0.0)),
+            heartbeat=float(settings.get("heartbeat", DEFAULT_HEARTBEAT)),
+        )
+
+    def update(self, value, now):
+        """Return True if `value` should be emitted."""
+        last_value = self.last_value
+        if (last_value is not None and
+            now - self.last_emit < self.heartbeat and
+            abs(value - last_value) <= max(self.absolute, self.relative * abs(last_value))):
+            self.suppressed += 1
+            return False
+
+        self.last_value = value
+        self.last_emit = now
+        self.emitted += 1
+        return True
@@ -0,0 +1,77 @@
+# event_bus.py
+
+import os
+import queue
+import threading
+
+
+class EventBus:
+    """Hands events from backend threads to the Socket.IO server in the same process.
+
+    Threads publish (namespace, event, data) from any OS thread; the server
+    drains the queue in a green thread and emits through its usual handlers.
+    publish never blocks, events are dropped and counted if the server is
+    not draining (e.g. not started yet).
+
+    The server is not monkey patched, so it cannot block on the queue itself.
+    Instead publish writes a byte to a pipe when the bus goes from idle to
+    pending, and the server waits for that pipe to become readable.
+    """
+
+    def __init__(self, maxsize=1024):
+        self._queue = queue.Queue(maxsize)
+        self._lock = threading.Lock()
+        self._signalled = False
+        self._read_fd, self._write_fd = os.pipe()
+        os.set_blocking(self._read_fd, False)
+        os.set_blocking(self._write_fd, False)
+
+        self.published = 0
+        self.dropped = 0
+
+    def fileno(self):
+        """Readable whenever events may be pending."""
+        return self._read_fd
+
+    def publish(self, namespace, event, data):
+        try:
+            self._queue.put_nowait((namespace, event, data))
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            return
+
+        with self._lock:
+            self.published += 1
+            signal, self._signalled = not self._signalled, True
+
+        if signal:
+            self.wake()
+
+    def wake(self):
+        """Make fileno() readable, e.g. to let the consumer check for shutdown."""
+        try:
+            os.write(self._write_fd, b"\0")
+        except BlockingIOError:
+            pass  # pipe is full, the consumer is awake anyway
+
+    def drain(self):
+        """Yield all queued events without blocking."""
+        # Empty the pipe first and only then clear the signal: a publish in
+        # between still sees it set, and its event is picked up below.
+        # Anything published after the clear writes a new wake byte.
+        try:
+            os.read(self._read_fd, 4096)
+        except BlockingIOError:
+            pass
+        with self._lock:
+            self._signalled = False
+
+        while True:
+            try:
+                yield self._queue.get_nowait()
+            except queue.Empty:
+                return
+
+
+event_bus = EventBus()
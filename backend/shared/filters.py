@@ -0,0 +1,124 @@
+# filters.py
+
+import numpy as np
+
+DEFAULT_SIZE = 8
+DEFAULT_ALPHA = 0.2
+DEFAULT_MAX_REJECTS = 3
+
+
+class Filter:
+    """Smooths the raw samples of one channel, read out with value() at the output rate.
+
+    With `outlier` set, a sample further than `outlier` from the last accepted
+    sample is dropped as a spike. After `max_rejects` such samples in a row
+    the signal really moved and samples are accepted again.
+    """
+
+    def __init__(self, outlier=None, max_rejects=DEFAULT_MAX_REJECTS):
+        self.outlier = outlier
+        self.max_rejects = max_rejects
+        self.last = None
+        self.rejects = 0
+        self.rejected = 0
+
+    @classmethod
+    def from_settings(cls, settings):
+        """Create a filter from a sensor's "filter" block, e.g. {"type": "median", "size": 5, "outlier": 0.5}."""
+        settings = settings or {}
+        filter_type = settings.get("type", "none")
+        outlier = settings.get("outlier")
+        common = {
+            "outlier": float(outlier) if outlier is not None else None,
+            "max_rejects": int(settings.get("max_rejects", DEFAULT_MAX_REJECTS)),
+        }
+
+        if filter_type == "none":
+            return Filter(**common)
+        if filter_type == "average":
+            return MovingAverage(int(settings.get("size", DEFAULT_SIZE)), **common)
+        if filter_type == "median":
+            return Median(int(settings.get("size", DEFAULT_SIZE)), **common)
+        if filter_type == "ema":
+            return ExponentialAverage(float(settings.get("alpha", DEFAULT_ALPHA)), **common)
+        raise ValueError(f"filter type must be one of none, average, median, ema, not '{filter_type}'")
+
+    def add(self, sample):
+        if self.outlier is not None and self.last is not None and abs(sample - self.last) > self.outlier:
+            self.rejects += 1
+            if self.rejects <= self.max_rejects:
+                self.rejected += 1
+                return
+        self.rejects = 0
+        self.last = sample
+        self._add(sample)
+
+    def _add(self, sample):
+        pass
+
+    def value(self):
+        """Filtered value, NaN before the first sample."""
+        return self.last if self.last is not None else np.nan
+
+
+class RingFilter(Filter):
+    """Filter over the last `size` samples, kept in a preallocated ring buffer."""
+
+    def __init__(self, size, **kwargs):
+        super().__init__(**kwargs)
+        if size < 1:
+            raise ValueError(f"filter size must be at least 1, not {size}")
+        self.buffer = np.zeros(size)
+        self.size = size
+        self.head = 0
+        self.count = 0
+
+    def _add(self, sample):
+        self.buffer[self.head] = sample
+        self.head = (self.head + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def window(self):
+        return self.buffer if self.count == self.size else self.buffer[:self.count]
+
+
+class MovingAverage(RingFilter):
+    def __init__(self, size, **kwargs):
+        super().__init__(size, **kwargs)
+        self.total = 0.0
+
+    def _add(self, sample):
+        if self.count == self.size:
+            self.total -= self.buffer[self.head]
+        super()._add(sample)
+        self.total += sample
+
+        if self.head == 0:
+            self.total = float(self.buffer.sum())  # drop accumulated rounding errors once per lap
+
+    def value(self):
+        return self.total / self.count if self.count else np.nan
+
+
+class Median(RingFilter):
+    def value(self):
+        return float(np.median(self.window())) if self.count else np.nan
+
+
+class ExponentialAverage(Filter):
+    def __init__(self, alpha, **kwargs):
+        super().__init__(**kwargs)
+        if not 0 < alpha <= 1:
+            raise ValueError(f"filter alpha must be in (0, 1], not {alpha}")
+        self.alpha = alpha
+        self.average = np.nan
+
+    def _add(self, sample):
+        if self.average != self.average:  # first sample
+            self.average = sample
+        else:
+            self.average += self.alpha * (sample - self.average)
+
+    def value(self):
+        return self.average
@@ -0,0 +1,193 @@
+# history.py
+
+import threading
+
+import numpy as np
+
+# Samples kept per sensor and resolution, memory per sensor is fixed:
+# raw 4096 * 12 bytes + 1 s 3600 * 20 bytes + 10 s 8640 * 20 bytes, about 290 kB
+RAW_CAPACITY = 4096     # newest samples as emitted (about 2 min at 30 Hz)
+ROLLUPS = (
+    (1.0, 3600),        # 1 s buckets, 1 hour
+    (10.0, 8640),       # 10 s buckets, 24 hours
+)
+
+
+class RingBuffer:
+    """Fixed-size columns (time plus one or more float32 values) overwritten oldest first."""
+
+    def __init__(self, capacity, columns=1):
+        self.capacity = capacity
+        self.times = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, columns), dtype=np.float32)
+        self.head = 0       # next write position
+        self.count = 0
+
+    def append(self, timestamp, value):
+        self.times[self.head] = timestamp
+        self.values[self.head, 0] = value
+        self._advance()
+
+    def append_row(self, timestamp, row):
+        self.times[self.head] = timestamp
+        self.values[self.head] = row
+        self._advance()
+
+    def _advance(self):
+        self.head = (self.head + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+
+    def covers(self, start):
+        """True if nothing newer than `start` has been overwritten yet."""
+        return self.count < self.capacity or self.times[self.head] <= start
+
+    def window(self, start, end):
+        """Copy of (times, values) with start <= time <= end, oldest first."""
+        if self.count < self.capacity:
+            times, values = self.times[:self.count], self.values[:self.count]
+        else:
+            times = np.concatenate((self.times[self.head:], self.times[:self.head]))
+            values = np.concatenate((self.values[self.head:], self.values[:self.head]))
+
+        first = np.searchsorted(times, start, side="left")
+        last = np.searchsorted(times, end, side="right")
+        return times[first:last].copy(), values[first:last].copy()
+
+
+class Rollup:
+    """Min/max/mean per fixed time bucket, stored in a RingBuffer once the bucket is complete."""
+
+    def __init__(self, interval, capacity):
+        self.interval = interval
+        self.buffer = RingBuffer(capacity, columns=3)  # min, max, mean
+        self.bucket = None
+        self.minimum = self.maximum = self.total = 0.0
+        self.samples = 0
+
+    def add(self, timestamp, value):
+        bucket = timestamp // self.interval
+        if bucket != self.bucket:
+            self.flush()
+            self.bucket = bucket
+            self.minimum = self.maximum = value
+            self.total = 0.0
+            self.samples = 0
+
+        self.minimum = min(self.minimum, value)
+        self.maximum = max(self.maximum, value)
+        self.total += value
+        self.samples += 1
+
+    def flush(self):
+        if self.samples:
+            self.buffer.append_row(self.bucket * self.interval, (self.minimum, self.maximum, self.total / self.samples))
+            self.samples = 0
+
+
+class SensorHistory:
+    def __init__(self):
+        self.raw = RingBuffer(RAW_CAPACITY)
+        self.rollups = [Rollup(interval, capacity) for interval, capacity in ROLLUPS]
+
+    def add(self, timestamp, value):
+        self.raw.append(timestamp, value)
+        for rollup in self.rollups:
+            rollup.add(timestamp, value)
+
+
+def lttb(times, values, points):
+    """Largest-Triangle-Three-Buckets: indexes of `points` samples that keep the shape of the series."""
+    length = len(times)
+    if points >= length or points < 3:
+        return np.arange(length)
+
+    indexes = np.empty(points, dtype=np.int64)
+    indexes[0], indexes[-1] = 0, length - 1
+
+    # points - 2 buckets between the fixed first and last sample, each at least one sample wide
+    edges = np.linspace(1, length - 1, points - 1).astype(np.int64)
+    sizes = np.diff(edges)
+
+    # the average of the next bucket (the last sample for the last one) is the third triangle corner
+    average_times = np.append(np.add.reduceat(times[:-1], edges[:-1]) / sizes, times[-1])[1:]
+    average_values = np.append(np.add.reduceat(values[:-1], edges[:-1]) / sizes, values[-1])[1:]
+
+    times = times.tolist()
+    values = values.tolist()
+    selected = 0
+    for i in range(points - 2):
+        time_a, value_a = times[selected], values[selected]
+        time_c, value_c = average_times[i], average_values[i]
+
+        best_area = -1.0
+        for j in range(edges[i], edges[i + 1]):
+            area = abs((time_a - time_c) * (values[j] - value_a) - (time_a - times[j]) * (value_c - value_a))
+            if area > best_area:
+                best_area, selected = area, j
+        indexes[i + 1] = selected
+
+    return indexes
+
+
+def float32_list(values):
+    """float32 array to a list of floats without conversion noise (0.2, not 0.20000000298)."""
+    return values.astype(str).astype(np.float64).tolist()
+
+
+class History:
+    """Per-sensor ring buffers with 1 s and 10 s rollups, fed with the emitted data batches.
+
+    record() runs on the server's emit path and only writes into preallocated
+    arrays. query() copies a window under the lock and downsamples it outside,
+    so it can run in a worker thread.
+    """
+
+    def __init__(self):
+        self.sensors = {}
+        self._lock = threading.Lock()
+
+    def record(self, batch, timestamp):
+        with self._lock:
+            for app_id, value in batch.items():
+                try:
+                    value = float(value)
+                except (TypeError, ValueError):
+                    continue
+                sensor = self.sensors.get(app_id)
+                if sensor is None:
+                    sensor = self.sensors[app_id] = SensorHistory()
+                sensor.add(timestamp, value)
+
+    def query(self, app_id, start, end, points=500):
+        """Return {"resolution", "t", "v"} (plus "min"/"max" for rollups) for app_id between start and end.
+
+        The finest resolution that still holds `start` is used, then the
+        window is reduced to at most `points` samples with LTTB.
+        """
+        with self._lock:
+            sensor = self.sensors.get(app_id)
+            if sensor is None:
+                return {"resolution": None, "t": [], "v": []}
+
+            if sensor.raw.covers(start):
+                resolution = "raw"
+                times, values = sensor.raw.window(start, end)
+            else:
+                rollup = next((rollup for rollup in sensor.rollups if rollup.buffer.covers(start)), sensor.rollups[-1])
+                resolution = f"{rollup.interval:g}s"
+                times, values = rollup.buffer.window(start, end)
+
+        if resolution == "raw":
+            values = values[:, 0]
+            keep = lttb(times, values, points)
+            return {"resolution": resolution, "t": times[keep].tolist(), "v": float32_list(values[keep])}
+
+        keep = lttb(times, values[:, 2], points)
+        return {
+            "resolution": resolution,
+            "t": times[keep].tolist(),
+            "v": float32_list(values[keep, 2]),
+            "min": float32_list(values[keep, 0]),
+            "max": float32_list(values[keep, 1]),
+        }
@@ -0,0 +1,121 @@
+# scale.py
+
+import ast
+import math
+
+# Functions a scale formula may call, e.g. "abs(value - 40)"
+ALLOWED_FUNCTIONS = {
+    "abs": abs,
+    "min": min,
+    "max": max,
+    "round": round,
+    "sqrt": math.sqrt,
+}
+
+ALLOWED_NODES = (
+    ast.Expression,
+    ast.BinOp,
+    ast.UnaryOp,
+    ast.Constant,
+    ast.Name,
+    ast.Load,
+    ast.Call,
+    # Arithmetic operators
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow,
+    ast.UAdd, ast.USub,
+    # Bitwise operators for packed values
+    ast.BitAnd, ast.BitOr, ast.BitXor, ast.LShift, ast.RShift, ast.Invert,
+)
+
+# Powers and shifts grow with their right operand, so it has to be a small
+# constant and powers can't be nested, otherwise "value ** 10**9" would stall
+# the reading thread
+MAX_EXPONENT = 8
+MAX_SHIFT = 64
+
+
+def constant_operand(node):
+    """Return the number of a (possibly negated) numeric constant, None for anything else."""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        value = constant_operand(node.operand)
+        if value is None:
+            return None
+        return -value if isinstance(node.op, ast.USub) else value
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return node.value
+    return None
+
+
+def compile_scale(expression, variable="value"):
+    """Validate a scale formula and compile it into a reusable callable.
+
+    Only plain arithmetic on `variable`, numeric constants and the functions in
+    ALLOWED_FUNCTIONS are accepted. Raises ValueError for anything else, so bad
+    formulas are reported when the config is loaded instead of on every frame.
+    """
+    if not isinstance(expression, str):
+        raise ValueError(f"Scale must be a string, got {type(expression).__name__}")
+
+    try:
+        tree = ast.parse(expression.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ValueError(f"Invalid scale '{expression}': {e.msg}")
+
+    # Function names are only valid as the callee of a call, "value + abs" would fail on every frame
+    callees = {id(node.func) for node in ast.walk(tree) if isinstance(node, ast.Call)}
+
+    uses_variable = False
+    for node in ast.walk(tree):
+        if not isinstance(node, ALLOWED_NODES):
+            raise ValueError(f"Invalid scale '{expression}': '{type(node).__name__}' is not allowed")
+
+        if isinstance(node, ast.Constant) and not isinstance(node.value, (int, float)):
+            raise ValueError(f"Invalid scale '{expression}': only numeric constants are allowed")
+
+        if isinstance(node, ast.Name):
+            if node.id == variable:
+                uses_variable = True
+            elif node.id not in ALLOWED_FUNCTIONS:
+                raise ValueError(f"Invalid scale '{expression}': unknown name '{node.id}'")
+            elif id(node) not in callees:
+                raise ValueError(f"Invalid scale '{expression}': function '{node.id}' is not called")
+
+        if isinstance(node, ast.Call):
+            if not isinstance(node.func, ast.Name) or node.func.id not in ALLOWED_FUNCTIONS or node.keywords:
+                raise ValueError(f"Invalid scale '{expression}': unsupported function call")
+
+        if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Pow):
+            exponent = constant_operand(node.right)
+            if exponent is None or abs(exponent) > MAX_EXPONENT:
+                raise ValueError(f"Invalid scale '{expression}': exponent must be a constant between "
+                                 f"-{MAX_EXPONENT} and {MAX_EXPONENT}")
+            # (value ** 8) ** 8 would multiply the exponents
+            if any(isinstance(inner, ast.BinOp) and isinstance(inner.op, ast.Pow) for inner in ast.walk(node.left)):
+                raise ValueError(f"Invalid scale '{expression}': nested powers are not allowed")
+
+        if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.LShift, ast.RShift)):
+            shift = constant_operand(node.right)
+            if not isinstance(shift, int) or not 0 <= shift <= MAX_SHIFT:
+                raise ValueError(f"Invalid scale '{expression}': shift must be a constant between 0 and {MAX_SHIFT}")
+
+    if not uses_variable:
+        raise ValueError(f"Invalid scale '{expression}': formula does not use '{variable}'")
+
+    # Wrap the expression into "lambda value: <expression>" so each call is a plain function call
+    function = ast.Expression(
+        body=ast.Lambda(
+            args=ast.arguments(
+                posonlyargs=[],
+                args=[ast.arg(arg=variable)],
+                kwonlyargs=[],
+                kw_defaults=[],
+                defaults=[],
+            ),
+            body=tree.body,
+        )
+    )
+    ast.fix_missing_locations(function)
+
+    code = compile(function, f"<scale: {expression}>", "eval")
+    return eval(code, {"__builtins__": {}, **ALLOWED_FUNCTIONS})
@@ -13,6 +13,7 @@ class SharedState:
 
         self.vCan = False
         self.vLin = False
+        self.vAdc = False
         self.dev = False
         self.pimost = False
 
@@ -24,6 +25,11 @@ class SharedState:
 
         self.update = False
 
+        self.recorder = None    # FrameLog recording a session (--record)
+        self.datalog = None     # DataLog logging decoded sensor values (--datalog)
+        self.input_queue = queue.Queue(maxsize=64)  # control events from CAN/LIN for the input thread
+        self.replay = None      # ReplaySession being played back (--replay)
+
         #Thread States:
         self.toggle_app = threading.Event()
 
@@ -50,10 +56,12 @@ class SharedState:
             "app":      None,
             "can":      None,
             "lin":      None,
+            "input":    None,
             "adc":      None,
             "rti":      None,
             "ign":      None,
             "vcan":     None,
+            "replay":   None,
             "pimost":   None,
         }
 
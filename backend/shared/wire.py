@@ -0,0 +1,66 @@
+# wire.py
+
+import struct
+import time
+
+# Binary data message:
+#   header: version (u8), record size (u8), record count (u16)
+#   record: sensor index (u16), value (f32), monotonic timestamp in ms (u32, wraps after ~49 days)
+# All fields little-endian.
+VERSION = 1
+HEADER = struct.Struct("<BBH")
+RECORD = struct.Struct("<HfI")
+
+MAX_RECORDS = 0xFFFF
+
+
+class SensorIndex:
+    """Maps app_ids to the fixed-width numeric index used in binary messages."""
+
+    def __init__(self, app_ids=()):
+        self.ids = []
+        self.index = {}
+        for app_id in app_ids:
+            self.add(app_id)
+
+    def add(self, app_id):
+        if app_id not in self.index:
+            self.index[app_id] = len(self.ids)
+            self.ids.append(app_id)
+        return self.index[app_id]
+
+    def missing(self, app_ids):
+        return [app_id for app_id in app_ids if app_id not in self.index]
+
+
+def timestamp_ms():
+    return int(time.monotonic() * 1000) & 0xFFFFFFFF
+
+
+def encode_batch(batch, sensor_index, timestamp=None):
+    """Pack a {app_id: value} batch into one binary message. Unknown app_ids are added to the index."""
+    if timestamp is None:
+        timestamp = timestamp_ms()
+
+    count = min(len(batch), MAX_RECORDS)
+    buffer = bytearray(HEADER.size + count * RECORD.size)
+    HEADER.pack_into(buffer, 0, VERSION, RECORD.size, count)
+
+    offset = HEADER.size
+    for app_id, value in list(batch.items())[:count]:
+        RECORD.pack_into(buffer, offset, sensor_index.add(app_id), value, timestamp)
+        offset += RECORD.size
+
+    return bytes(buffer)
+
+
+def decode_batch(payload, sensor_index):
+    """Unpack a binary message into a list of (app_id, value, timestamp) tuples."""
+    version, record_size, count = HEADER.unpack_from(payload, 0)
+    if version != VERSION or record_size != RECORD.size:
+        raise ValueError(f"Unsupported data message version {version} / record size {record_size}")
+
+    return [
+        (sensor_index.ids[index], value, timestamp)
+        for index, value, timestamp in RECORD.iter_unpack(payload[HEADER.size:HEADER.size + count * RECORD.size])
+    ]
@@ -1,6 +1,7 @@
 import { io } from "socket.io-client";
 
 let settings;
+let sensorKeys = [];
 
 // Connect to the canbus namespace to receive continuous data stream
 const canChannel = io("ws://localhost:4001/can");
@@ -9,12 +10,65 @@ const canChannel = io("ws://localhost:4001/can");
 const handlesensorSettings = (data) => {
     settings = data.sensors;
     canChannel.connect();
+
+    // Opt in to the binary data format
+    canChannel.emit("format", "binary");
+
+    // Request the last known values, so gauges are filled right away
+    canChannel.emit("snapshot");
+};
+
+// Function to apply the last known values: { app_id: { value, timestamp, source }, ... }
+const handleSnapshot = (snapshot) => {
+    const data = {};
+    Object.keys(snapshot).forEach((id) => {
+        data[id] = snapshot[id].value;
+    });
+    postCarDataToMain(update(data));
+};
+
+// Function to map binary sensor indexes to settings keys
+const handleFormat = (data) => {
+    if (settings && data.format === 'binary') {
+        sensorKeys = data.ids.map((id) => Object.keys(settings).find((key) => settings[key].app_id === id));
+    }
+};
+
+// Function to decode binary car data
+// header: version (u8), record size (u8), count (u16) | record: index (u16), value (f32), timestamp (u32)
+const decode = (buffer) => {
+    const updatedData = {};
+    const view = new DataView(buffer);
+    const recordSize = view.getUint8(1);
+    const count = view.getUint16(2, true);
+
+    for (let i = 0; i < count; i++) {
+        const offset = 4 + i * recordSize;
+        const key = sensorKeys[view.getUint16(offset, true)];
+
+        if (key) {
+            updatedData[key] = view.getFloat32(offset + 2, true).toFixed(2);
+        }
+    }
+    return updatedData;
 };
 
 // Function to update car data
 const update = (data) => {
     const updatedData = {};
 
+    // Batched update: { app_id: value, ... }
+    if (settings && data != null && typeof data === 'object') {
+        Object.keys(settings).forEach((key) => {
+            const value = data[settings[key].app_id];
+
+            if (value !== undefined) {
+                updatedData[key] = Number(value).toFixed(2);
+            }
+        });
+        return updatedData;
+    }
+
     if (settings && data != null) {
         Object.keys(settings).forEach((key) => {
             const message = settings[key];
@@ -42,9 +96,15 @@ const postCarDataToMain = (data) => {
 // Listen for canbus settings
 canChannel.on("settings", handlesensorSettings);
 
+// Listen for negotiated data format
+canChannel.on("format", handleFormat);
+
+// Listen for snapshots of the last known values
+canChannel.on("snapshot", handleSnapshot);
+
 // Listen for continuous data stream from canbus namespace
 canChannel.on("data", (data) => {
-    data = update(data);
+    data = data instanceof ArrayBuffer ? decode(data) : update(data);
     postCarDataToMain(data);
 });
 
@@ -1,40 +1,70 @@
+import os
 import json
 import argparse
+import importlib.util
 import matplotlib.pyplot as plt
+import numpy as np
 import pandas as pd
 
+# Load the data log reader without importing the whole backend package (server, threads, ...)
+DATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'backend', 'datalog.py')
+
+def load_datalog_module():
+    spec = importlib.util.spec_from_file_location('datalog', DATALOG_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
 # Function to load data from a JSON file
 def load_json_data(file_path):
     with open(file_path, 'r') as f:
         return json.load(f)
 
-# Main function to plot the data
-def plot_data(file_path):
-    # Load the JSON data from the provided file path
-    data = load_json_data(file_path)
-
-    # Initialize the plot
-    plt.figure(figsize=(10, 6))
-
-    # Iterate through all the datasets (each with a 'label' and 'data')
-    for entry in data:
+# Datasets of a JSON export: label -> (timestamps, values)
+def load_json_series(file_path):
+    series = {}
+    for entry in load_json_data(file_path):
         if 'data' in entry:  # Check if the 'data' key exists
             data_points = entry['data']  # Get the data points (list of dictionaries)
 
             # Extract timestamps and values from the data
-            timestamps = [point['timestamp'] for point in data_points]
+            timestamps = pd.to_datetime([point['timestamp'] for point in data_points])
             values = [point['value'] for point in data_points]
+            series[entry.get('label', 'Unknown Label')] = (timestamps, values)
+    return series
 
-            # Convert timestamps to datetime objects
-            timestamps = pd.to_datetime(timestamps)
+# Columns of a data log session (directory) or partition (.vdat): "<module>/<app_id>" -> (timestamps, values)
+def load_datalog_series(path, names=None, start=None, end=None, points=None):
+    datalog = load_datalog_module()
 
-            # Plot the data on the same chart
-            plt.plot(timestamps, values, label=entry.get('label', 'Unknown Label'))
+    # --start/--end are seconds since the first sample of the session
+    if start is not None or end is not None:
+        first = (datalog.time_range(path) or (0.0, 0.0))[0]
+        start = None if start is None else first + start
+        end = None if end is None else first + end
+
+    series = {}
+    for name, (times, values) in datalog.read_session(path, start, end, names).items():
+        # Thin out long drives, matplotlib gets slow beyond a few hundred thousand points per line
+        if points and len(times) > points:
+            keep = np.linspace(0, len(times) - 1, points).astype(np.int64)
+            times, values = times[keep], values[keep]
+        series[name] = (pd.to_datetime(times, unit='s', utc=True).tz_convert(None), values)
+    return series
+
+# Main function to plot the data
+def plot_data(series, title):
+    # Initialize the plot
+    plt.figure(figsize=(10, 6))
+
+    # Plot every dataset on the same chart
+    for label, (timestamps, values) in series.items():
+        plt.plot(timestamps, values, label=label)
 
     # Customize the chart
     plt.xlabel('Timestamp')
     plt.ylabel('Value')
-    plt.title('Sensor Data - Line Chart')
+    plt.title(title)
     plt.xticks(rotation=45)  # Rotate timestamps for better readability
     plt.tight_layout()  # Adjust the plot to fit everything
     plt.grid(True)
@@ -45,9 +75,29 @@ def plot_data(file_path):
 
 # Set up argument parsing
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Plot data from a JSON file")
-    parser.add_argument("file_path", help="Path to the JSON file")
+    parser = argparse.ArgumentParser(description="Plot data from a JSON export or a V-Link data log (--datalog)")
+    parser.add_argument("file_path", help="Path to the JSON file, a data log session directory or a .vdat partition")
+    parser.add_argument("--ids", help="Comma separated data log columns to plot, e.g. can/map,adc/oil_temp (default: all)")
+    parser.add_argument("--start", type=float, help="Data log: seconds after the first sample to start at")
+    parser.add_argument("--end", type=float, help="Data log: seconds after the first sample to end at")
+    parser.add_argument("--points", type=int, default=200000, help="Data log: maximum points per column, 0 = all")
+    parser.add_argument("--list", action="store_true", help="Data log: list the columns instead of plotting them")
     args = parser.parse_args()
 
-    # Plot the data
-    plot_data(args.file_path)
+    if args.file_path.endswith('.json'):
+        series = load_json_series(args.file_path)
+        title = 'Sensor Data - Line Chart'
+    else:
+        names = set(args.ids.split(',')) if args.ids else None
+        series = load_datalog_series(args.file_path, names, args.start, args.end, args.points)
+        title = f'Sensor Data - {os.path.basename(os.path.normpath(args.file_path))}'
+
+    if args.list:
+        for label, (timestamps, values) in sorted(series.items()):
+            if not len(values):
+                print(f"{label:<32} {0:>9} samples")  # nothing left between --start and --end
+                continue
+            print(f"{label:<32} {len(values):>9} samples  {timestamps[0]} - {timestamps[-1]}")
+    else:
+        # Plot the data
+        plot_data(series, title)
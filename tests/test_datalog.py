@@ -0,0 +1,43 @@
+import numpy as np
+
+from backend.datalog import DataLog, MAX_CHUNK_SPAN, read_session
+
+
+def write_session(directory, samples):
+    datalog = DataLog(str(directory))
+    datalog.start()
+    for timestamp, value in samples:
+        datalog.append("can", "rpm", value, timestamp)
+    datalog.close()
+    return datalog
+
+
+def test_clock_step_back_starts_a_new_chunk(tmp_path):
+    samples = [(1_700_000_000.0, 1.0), (1_700_000_000.5, 2.0),
+               (1_699_999_990.0, 3.0), (1_699_999_990.25, 4.0)]
+    datalog = write_session(tmp_path, samples)
+
+    assert datalog.chunks == 2
+    times, values = read_session(datalog.session)["can/rpm"]
+    np.testing.assert_allclose(times, sorted(t for t, _ in samples))
+    np.testing.assert_allclose(values, [3.0, 4.0, 1.0, 2.0])
+
+
+def test_clock_jump_forward_starts_a_new_chunk(tmp_path):
+    # 60 days is beyond the ~49.7 days a u32 millisecond offset can hold
+    samples = [(1_700_000_000.0, 1.0), (1_700_000_000.0 + 60 * 86400, 2.0)]
+    datalog = write_session(tmp_path, samples)
+
+    assert datalog.chunks == 2
+    times, values = read_session(datalog.session)["can/rpm"]
+    np.testing.assert_allclose(times, [t for t, _ in samples])
+    np.testing.assert_allclose(values, [1.0, 2.0])
+
+
+def test_samples_within_span_share_one_chunk(tmp_path):
+    samples = [(1_700_000_000.0, 1.0), (1_700_000_000.0 + MAX_CHUNK_SPAN, 2.0)]
+    datalog = write_session(tmp_path, samples)
+
+    assert datalog.chunks == 1
+    times, _ = read_session(datalog.session)["can/rpm"]
+    np.testing.assert_allclose(times, [t for t, _ in samples])
@@ -0,0 +1,41 @@
+import os
+import select
+
+from backend.shared import event_bus as event_bus_module
+from backend.shared.event_bus import EventBus
+
+
+def readable(bus):
+    return bool(select.select([bus.fileno()], [], [], 0)[0])
+
+
+def test_publish_wakes_an_idle_bus():
+    bus = EventBus()
+    assert not readable(bus)
+
+    bus.publish("/can", "data", {"rpm": 1})
+    assert readable(bus)
+    assert list(bus.drain()) == [("/can", "data", {"rpm": 1})]
+    assert not readable(bus)
+
+
+def test_publish_while_draining_the_pipe_is_not_lost(monkeypatch):
+    bus = EventBus()
+    bus.publish("/can", "data", 1)
+
+    # Publish from inside the pipe read, like a batcher thread would while
+    # os.read has released the GIL
+    real_read = os.read
+
+    def read_with_publish(fd, size):
+        monkeypatch.setattr(event_bus_module.os, "read", real_read)
+        bus.publish("/adc", "data", 2)
+        return real_read(fd, size)
+
+    monkeypatch.setattr(event_bus_module.os, "read", read_with_publish)
+    assert [data for _, _, data in bus.drain()] == [1, 2]
+
+    # The next publish has to make the pipe readable again
+    bus.publish("/can", "data", 3)
+    assert readable(bus)
+    assert [data for _, _, data in bus.drain()] == [3]